@@ -1,31 +1,41 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
-from jose import jwt
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from .models import User, UserCreate, UserOut
-from .database import SessionLocal
+from .database import AsyncSessionLocal, get_async_db
+from .services.cache import TTLCache
+from .services.passwords import PASSWORD_HASHER, PasswordHasherBusy, password_context
 import os
+import time
 
 SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-router = APIRouter()
+# Verified tokens and their users, so an authenticated request skips the
+# signature check and the user query. Entries never outlive the token's
+# exp; the TTL bounds how stale a cached user row can get.
+CURRENT_USER_CACHE = TTLCache(
+    max_entries=int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "2048")),
+    ttl=float(os.getenv("AUTH_CACHE_TTL", "300")),
+)
+bearer_scheme = HTTPBearer(auto_error=False)
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+router = APIRouter()
 
+# Blocking helpers for scripts; request handlers go through PASSWORD_HASHER
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return password_context().hash(password)
+
+def hasher_busy():
+    return HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
@@ -34,26 +44,82 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-@router.post("/register", response_model=UserOut)
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user.email).first()
-    if db_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    hashed_password = get_password_hash(user.password)
+def decode_access_token(token: str):
+    """Claims of a token from create_access_token; 401 if invalid or expired"""
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+def unauthorized(detail="Not authenticated"):
+    return HTTPException(status_code=401, detail=detail, headers={"WWW-Authenticate": "Bearer"})
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)):
+    """The user a Bearer access token belongs to; 401 if missing, invalid or expired"""
+    if credentials is None:
+        raise unauthorized()
+    token = credentials.credentials
+    cached = CURRENT_USER_CACHE.get(token)
+    if cached is not None:
+        expires_at, user = cached
+        if expires_at > time.time():
+            return user
+        CURRENT_USER_CACHE.invalidate(token)
+        raise unauthorized("Invalid or expired token")
+    try:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        user_id = int(claims["sub"])
+    except (JWTError, KeyError, ValueError):
+        raise unauthorized("Invalid or expired token")
+    if claims.get("purpose"):
+        # Signed tokens for other flows (e.g. the Uber OAuth state) are not access tokens
+        raise unauthorized("Invalid or expired token")
+    async with AsyncSessionLocal() as db:
+        db_user = await db.get(User, user_id)
+    if db_user is None:
+        raise unauthorized("User no longer exists")
+    user = UserOut(id=db_user.id, email=db_user.email, name=db_user.name)
+    CURRENT_USER_CACHE.set(token, (claims["exp"], user))
+    return user
+
+async def create_user(user: UserCreate, db: AsyncSession):
+    """Insert a user; the unique index on email rejects duplicates"""
+    try:
+        hashed_password = await PASSWORD_HASHER.hash(user.password)
+    except PasswordHasherBusy:
+        raise hasher_busy()
     new_user = User(email=user.email, hashed_password=hashed_password, name=user.name)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Email already registered")
     return new_user
 
+@router.post("/register", response_model=UserOut)
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    return await create_user(user, db)
+
 @router.post("/signup", response_model=UserOut)
-def signup(user: UserCreate, db: Session = Depends(get_db)):
-    return register(user, db)
+async def signup(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    return await create_user(user, db)
 
 @router.post("/login")
-def login(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user.email).first()
-    if not db_user or not verify_password(user.password, db_user.hashed_password):
+async def login(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = (await db.execute(select(User).where(User.email == user.email))).scalar_one_or_none()
+    if not db_user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    try:
+        valid, new_hash = await PASSWORD_HASHER.verify_and_update(user.password, db_user.hashed_password)
+    except PasswordHasherBusy:
+        raise hasher_busy()
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        # Stored with an outdated cost factor (BCRYPT_ROUNDS changed): upgrade it now
+        db_user.hashed_password = new_hash
+        await db.commit()
     access_token = create_access_token(data={"sub": str(db_user.id)})
-    return {"access_token": access_token, "token_type": "bearer", "user": UserOut.from_orm(db_user)} 
\ No newline at end of file
+    user_out = UserOut(id=db_user.id, email=db_user.email, name=db_user.name)
+    return {"access_token": access_token, "token_type": "bearer", "user": user_out}
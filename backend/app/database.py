@@ -1,9 +1,121 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.orm import sessionmaker, declarative_base
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./travel_agent.db")
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# SQLite engine profile, applied to every new connection. WAL lets readers
+# run alongside a writer, and busy_timeout makes a writer wait for the lock
+# instead of failing with "database is locked".
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+# Negative cache_size is in KiB: 64 MiB of page cache per connection
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# Connection pool sizing (ignored for in-memory SQLite)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+
+def is_sqlite(url):
+    return url.startswith("sqlite")
+
+
+def async_url(url):
+    """The async-driver form of a database URL"""
+    for prefix, async_prefix in (("sqlite://", "sqlite+aiosqlite://"), ("postgresql://", "postgresql+asyncpg://")):
+        if url.startswith(prefix):
+            return async_prefix + url[len(prefix):]
+    return url
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.close()
+
+
+def engine_options(url):
+    """create_engine keyword arguments for the configured profile"""
+    if not is_sqlite(url):
+        return {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW,
+                "pool_timeout": DB_POOL_TIMEOUT, "pool_pre_ping": True}
+    options = {"connect_args": {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}}
+    if ":memory:" not in url and "mode=memory" not in url:
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    return options
+
+
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+if is_sqlite(DATABASE_URL):
+    event.listen(engine, "connect", set_sqlite_pragmas)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base() 
\ No newline at end of file
+Base = declarative_base()
+
+# Async engine for routes that should not hold a threadpool slot while they
+# wait on the database. Needs an async driver (aiosqlite, asyncpg).
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", async_url(DATABASE_URL))
+try:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    async_options = engine_options(ASYNC_DATABASE_URL)
+    async_options.get("connect_args", {}).pop("check_same_thread", None)
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **async_options)
+    if is_sqlite(ASYNC_DATABASE_URL):
+        event.listen(async_engine.sync_engine, "connect", set_sqlite_pragmas)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+except ImportError as e:
+    logger.warning("Async database engine unavailable: %s", e)
+    async_engine = None
+    AsyncSessionLocal = None
+
+
+# Indexes models no longer declare, dropped from existing databases at startup
+RETIRED_INDEXES = [
+    "ix_bookings_created",  # booking history is always listed per user
+]
+
+
+def upgrade_schema(metadata, bind):
+    """Add columns and indexes that models gained after their table was created.
+
+    create_all only creates missing tables. This covers the additive part of
+    a schema change (nullable columns, new indexes) plus RETIRED_INDEXES;
+    columns are never altered or dropped.
+    """
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for name in RETIRED_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        for table in metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    column_type = column.type.compile(dialect=bind.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+
+async def get_async_db():
+    """Request-scoped AsyncSession for FastAPI dependencies"""
+    if AsyncSessionLocal is None:
+        raise RuntimeError("No async database driver installed (pip install aiosqlite)")
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def close_async_engine():
+    if async_engine is not None:
+        await async_engine.dispose()
@@ -1,12 +1,14 @@
 import os
-from fastapi import FastAPI, HTTPException
+import time
+import logging
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from dotenv import load_dotenv
 import google.generativeai as genai
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from .database import Base, engine
+from fastapi.responses import FileResponse, PlainTextResponse
+from .database import Base, engine, close_async_engine, upgrade_schema
 from .auth import router as auth_router
 from .routes.flights import router as flights_router
 from .routes.hotels import router as hotels_router
@@ -14,9 +16,18 @@ from .routes.transport import router as transport_router
 from .routes.bookings import router as bookings_router
 from .routes.users import router as users_router
 from .routes.payments import router as payments_router
+from .routes.locations import router as locations_router
+from .routes.trips import router as trips_router
+from .services.http_client import start_http_clients, close_http_clients
+from .services.uber_tokens import start_uber_token_refresher, stop_uber_token_refresher
+from .services.passwords import PASSWORD_HASHER
+from .services.metrics import REGISTRY, HTTP_REQUEST_DURATION, upstream_timer
 import traceback
 
 load_dotenv()
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
+# httpx logs full request URLs at INFO, which would include upstream API keys
+logging.getLogger("httpx").setLevel(logging.WARNING)
 print("Loaded AVIATIONSTACK_API_KEY:", os.getenv("AVIATIONSTACK_API_KEY"))
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
@@ -35,9 +46,46 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template (e.g. /api/bookings/{booking_id}) to keep cardinality bounded
+        HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, request.method, route_template(request), str(status))
+
+def route_template(request):
+    """Full path template of the matched route, include_router prefixes included"""
+    route = request.scope.get("route")
+    template = getattr(route, "path", None)
+    if not template:
+        return "static"
+    # Recent FastAPI leaves include_router prefixes off route.path; the part of
+    # the request path in front of what the route's own pattern matches is the prefix
+    path = request.scope["path"]
+    for i, char in enumerate(path):
+        if char == "/" and route.path_regex.match(path[i:]):
+            return path[:i] + template
+    return template
+
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     Base.metadata.create_all(bind=engine)
+    upgrade_schema(Base.metadata, engine)
+    await start_http_clients()
+    start_uber_token_refresher()
+    PASSWORD_HASHER.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await stop_uber_token_refresher()
+    await close_http_clients()
+    await close_async_engine()
+    PASSWORD_HASHER.shutdown()
 
 app.include_router(auth_router, prefix="/api/auth")
 app.include_router(flights_router, prefix="/api")
@@ -46,6 +94,13 @@ app.include_router(transport_router, prefix="/api")
 app.include_router(bookings_router, prefix="/api")
 app.include_router(users_router, prefix="/api")
 app.include_router(payments_router, prefix="/api")
+app.include_router(locations_router, prefix="/api")
+app.include_router(trips_router, prefix="/api")
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus text exposition of request and upstream latencies"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 class ChatRequest(BaseModel):
     message: str
@@ -59,7 +114,8 @@ def health():
 def chat(req: ChatRequest):
     try:
         model = genai.GenerativeModel("gemini-2.0-flash")
-        response = model.generate_content(req.message)
+        with upstream_timer("gemini"):
+            response = model.generate_content(req.message)
         return {"success": True, "response": response.text}
     except Exception as e:
         print("=== ERROR in /api/ai/chat ===")
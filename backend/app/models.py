@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index, Text
 from sqlalchemy.orm import relationship
 from .database import Base
 from pydantic import BaseModel
@@ -43,14 +43,57 @@ class Transport(Base):
 
 class Booking(Base):
     __tablename__ = "bookings"
+    __table_args__ = (
+        # A user's bookings, newest first; SQLite appends the rowid (id) to
+        # every index, so this also serves the (created_at, id) keyset order
+        Index("ix_bookings_user_created", "user_id", "created_at"),
+        # One booking per Idempotency-Key and user, whichever worker takes the
+        # retry; rows without a key (NULL) are not constrained
+        Index("ux_bookings_user_idempotency_key", "user_id", "idempotency_key", unique=True),
+        # AUTOINCREMENT: ids of deleted bookings are never handed out again
+        {"sqlite_autoincrement": True},
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     booking_type = Column(String)  # flight, hotel, transport
-    item_id = Column(Integer)
-    status = Column(String, default="confirmed")
+    item_id = Column(String)  # e.g. "AI101", "pune_hotel_3"
+    status = Column(String, default="confirmed", index=True)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    idempotency_key = Column(String)
+    request_fingerprint = Column(String)  # of the create request; a reused key must match
     user = relationship("User")
 
+class IdempotentOrder(Base):
+    """A payment order Idempotency-Key, claimed before the Razorpay order is created.
+
+    response stays NULL while the order is being created, then holds the
+    create-order response that retries of the key get back.
+    """
+    __tablename__ = "idempotent_orders"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    idempotency_key = Column(String, primary_key=True)
+    request_fingerprint = Column(String, nullable=False)
+    order_id = Column(String)
+    response = Column(Text)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, index=True)
+
+class UberToken(Base):
+    """A user's Uber OAuth tokens; expires_at is UTC"""
+    __tablename__ = "uber_tokens"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    access_token = Column(String, nullable=False)
+    refresh_token = Column(String)
+    scope = Column(String)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+class UserPreferences(Base):
+    """A user's preferences as a JSON object"""
+    __tablename__ = "user_preferences"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    data = Column(Text, nullable=False, default="{}")
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
 # Pydantic Schemas
 class UserCreate(BaseModel):
     email: str
@@ -99,7 +142,7 @@ class BookingOut(BaseModel):
     id: int
     user_id: int
     booking_type: str
-    item_id: int
+    item_id: str
     status: str
     created_at: datetime.datetime
     class Config:
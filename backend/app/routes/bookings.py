@@ -1,40 +1,164 @@
-from fastapi import APIRouter, HTTPException, Request
-from ..models import BookingOut
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import and_, or_, select, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 import datetime
+from ..auth import get_current_user
+from ..database import AsyncSessionLocal, get_async_db
+from ..models import Booking, BookingOut, UserOut
+from ..services.pagination import encode_cursor, decode_cursor
+from ..services.idempotency import (
+    IdempotencyStore, IdempotencyConflict, idempotency_cutoff, idempotency_key, fingerprint
+)
 
 router = APIRouter(prefix="/bookings", tags=["bookings"])
 
-bookings = []
+# Page size for booking history when no limit is given, and the most one page may hold
+BOOKINGS_PAGE_SIZE = 50
+BOOKINGS_PAGE_SIZE_MAX = 200
 
-@router.post("/")
-async def create_booking(request: Request):
+# Retried booking requests with the same Idempotency-Key return the first booking
+BOOKING_IDEMPOTENCY = IdempotencyStore()
+
+@router.post("/", response_model=BookingOut)
+async def create_booking(request: Request, response: Response, user: UserOut = Depends(get_current_user)):
+    """Create a booking for the current user.
+
+    With an Idempotency-Key header, a retry of the same request returns the
+    booking created the first time (marked Idempotent-Replayed: true) and a
+    concurrent duplicate waits for it instead of booking twice. The key is
+    stored with the booking, so this holds whichever worker gets the retry.
+    """
     data = await request.json()
-    booking = {
-        "id": len(bookings) + 1,
-        "user_id": 1,  # Dummy user
-        "booking_type": data.get('type', 'flight'),
-        "item_id": data.get('id', 1),
-        "status": 'confirmed',
-        "created_at": datetime.datetime.utcnow().isoformat()
-    }
-    bookings.append(booking)
+    try:
+        key = idempotency_key(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if key is None:
+        booking, _ = await insert_booking(data, user.id)
+        return booking
+    request_fingerprint = fingerprint(data)
+    try:
+        (booking, stored), replayed = await BOOKING_IDEMPOTENCY.run(
+            f"{user.id}:{key}", request_fingerprint,
+            lambda: insert_booking(data, user.id, key, request_fingerprint)
+        )
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if replayed or stored:
+        response.headers["Idempotent-Replayed"] = "true"
     return booking
 
+def booking_record(booking):
+    return {
+        "id": booking.id,
+        "user_id": booking.user_id,
+        "booking_type": booking.booking_type,
+        "item_id": booking.item_id,
+        "status": booking.status,
+        "created_at": booking.created_at
+    }
+
+async def insert_booking(data, user_id, key=None, request_fingerprint=None):
+    """Insert a booking; returns (booking, replayed).
+
+    With `key`, the unique (user_id, idempotency_key) index turns a duplicate
+    into the booking already stored for the key (replayed is True then).
+    A key older than IDEMPOTENCY_TTL is released from its booking and used
+    afresh. Uses its own session since duplicates may outlive the first request.
+    """
+    async with AsyncSessionLocal() as db:
+        for attempt in range(2):
+            booking = Booking(
+                user_id=user_id,
+                booking_type=data.get('type', 'flight'),
+                item_id=str(data.get('id', 1)),
+                status='confirmed',
+                idempotency_key=key,
+                request_fingerprint=request_fingerprint
+            )
+            db.add(booking)
+            try:
+                await db.commit()
+                return booking_record(booking), False
+            except IntegrityError:
+                if key is None or attempt:
+                    raise
+                await db.rollback()
+            existing = (await db.execute(
+                select(Booking).where(Booking.user_id == user_id, Booking.idempotency_key == key)
+            )).scalar_one_or_none()
+            if existing is None:
+                # Cancelled since the insert failed; the key is free again
+                continue
+            if existing.created_at < idempotency_cutoff():
+                existing.idempotency_key = None
+                existing.request_fingerprint = None
+                await db.commit()
+                continue
+            if existing.request_fingerprint != request_fingerprint:
+                raise IdempotencyConflict("Idempotency-Key was already used with a different request")
+            return booking_record(existing), True
+
 @router.get("/", response_model=list[BookingOut])
-def get_bookings():
-    return bookings
+async def get_bookings(
+    response: Response,
+    status: str = None,
+    type: str = None,
+    limit: int = BOOKINGS_PAGE_SIZE,
+    cursor: str = None,
+    db: AsyncSession = Depends(get_async_db),
+    user: UserOut = Depends(get_current_user)
+):
+    """The current user's bookings newest first, optionally for one status and booking type.
+
+    Pages are keyset-paginated on (created_at, id): each page seeks past the
+    last row of the previous one through the index instead of skipping an
+    offset. When more bookings remain, the cursor for the next page is
+    returned in the X-Next-Cursor header.
+    """
+    if not 1 <= limit <= BOOKINGS_PAGE_SIZE_MAX:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {BOOKINGS_PAGE_SIZE_MAX}")
+    query = select(Booking).where(Booking.user_id == user.id)
+    if status:
+        query = query.where(Booking.status == status)
+    if type:
+        query = query.where(Booking.booking_type == type)
+    if cursor:
+        try:
+            position = decode_cursor(cursor)
+            created_at = datetime.datetime.fromisoformat(position["created_at"])
+            last_id = int(position["id"])
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where(or_(
+            Booking.created_at < created_at,
+            and_(Booking.created_at == created_at, Booking.id < last_id)
+        ))
+    query = query.order_by(Booking.created_at.desc(), Booking.id.desc()).limit(limit + 1)
+    rows = (await db.execute(query)).scalars().all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor({"created_at": last.created_at.isoformat(), "id": last.id})
+    return rows
 
 @router.get("/{booking_id}", response_model=BookingOut)
-def get_booking(booking_id: int):
-    for b in bookings:
-        if b.id == booking_id:
-            return b
-    raise HTTPException(status_code=404, detail="Booking not found")
+async def get_booking(
+    booking_id: int, db: AsyncSession = Depends(get_async_db), user: UserOut = Depends(get_current_user)
+):
+    booking = await db.get(Booking, booking_id)
+    # Other users' bookings are reported as missing rather than forbidden
+    if booking is None or booking.user_id != user.id:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    return booking
 
 @router.delete("/{booking_id}")
-def cancel_booking(booking_id: int):
-    for b in bookings:
-        if b.id == booking_id:
-            bookings.remove(b)
-            return {"success": True}
-    raise HTTPException(status_code=404, detail="Booking not found") 
\ No newline at end of file
+async def cancel_booking(
+    booking_id: int, db: AsyncSession = Depends(get_async_db), user: UserOut = Depends(get_current_user)
+):
+    result = await db.execute(delete(Booking).where(Booking.id == booking_id, Booking.user_id == user.id))
+    await db.commit()
+    if not result.rowcount:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    return {"success": True}
@@ -1,14 +1,30 @@
 from fastapi import APIRouter, HTTPException, Request
 import os
-import httpx
+import time
+import asyncio
+import logging
 import traceback
 from datetime import datetime, timedelta
 import random
+from ..services.http_client import get_http_client
+from ..services.cache import TTLCache
+from ..services.singleflight import SingleFlight, normalize_key
+from ..services.flight_inventory import FLIGHT_INVENTORY
+from ..services.locations import LOCATIONS
+from ..services.money import Money
+from ..services.resilience import CircuitBreaker, LatencyTracker, hedged
+from ..services.streaming import stream_results
+from ..services.batch import batch_queries, batch_response, run_batch
+from ..services.metrics import REGISTRY, CallbackMetric, upstream_timer
 
 router = APIRouter(prefix="/flights", tags=["flights"])
+logger = logging.getLogger(__name__)
 
 AVIATIONSTACK_API_KEY = os.getenv("AVIATIONSTACK_API_KEY", "f2f6c52f323bf4cc7e2dd490bf60f77f")
 AVIATIONSTACK_URL = "https://api.aviationstack.com/v1/flights"  # Changed to HTTPS
+AVIATIONSTACK_HOST = "api.aviationstack.com"
+# Fraction of AviationStack responses logged at DEBUG level (0 disables)
+AVIATIONSTACK_DEBUG_SAMPLE_RATE = float(os.getenv("AVIATIONSTACK_DEBUG_SAMPLE_RATE", "0"))
 
 # Mock flight data as fallback
 MOCK_FLIGHTS = [
@@ -19,7 +35,7 @@ MOCK_FLIGHTS = [
         "to_city": "BOM",
         "depart_time": "10:00",
         "arrive_time": "12:00",
-        "price": "$150",
+        "price": Money.of(150, "USD"),
         "stops": 0
     },
     {
@@ -29,7 +45,7 @@ MOCK_FLIGHTS = [
         "to_city": "BOM",
         "depart_time": "14:30",
         "arrive_time": "16:30",
-        "price": "$120",
+        "price": Money.of(120, "USD"),
         "stops": 0
     },
     {
@@ -39,7 +55,7 @@ MOCK_FLIGHTS = [
         "to_city": "BOM",
         "depart_time": "18:00",
         "arrive_time": "20:00",
-        "price": "$110",
+        "price": Money.of(110, "USD"),
         "stops": 0
     },
     {
@@ -49,11 +65,132 @@ MOCK_FLIGHTS = [
         "to_city": "BOM",
         "depart_time": "08:00",
         "arrive_time": "10:00",
-        "price": "$180",
+        "price": Money.of(180, "USD"),
         "stops": 0
     }
 ]
 
+# Upstream schedules barely change within minutes, so cache them per route
+FLIGHT_CACHE = TTLCache(
+    max_entries=int(os.getenv("FLIGHT_CACHE_MAX_ENTRIES", "1024")),
+    ttl=float(os.getenv("FLIGHT_CACHE_TTL", "300")),
+    stale_ttl=float(os.getenv("FLIGHT_CACHE_STALE_TTL", "600")),
+)
+# Concurrent cache misses for the same route share one upstream call
+FLIGHT_SEARCHES = SingleFlight()
+
+# Fail fast to the local inventory when AviationStack is slow or down
+AVIATIONSTACK_BREAKER = CircuitBreaker(
+    "aviationstack",
+    failure_threshold=int(os.getenv("AVIATIONSTACK_BREAKER_FAILURES", "5")),
+    reset_timeout=float(os.getenv("AVIATIONSTACK_BREAKER_RESET", "30")),
+)
+AVIATIONSTACK_LATENCY = LatencyTracker()
+# Overall latency budget for one search, including any hedged request
+AVIATIONSTACK_TIMEOUT = float(os.getenv("AVIATIONSTACK_TIMEOUT", "3.0"))
+# Send a second request once the first is slower than the observed p95
+AVIATIONSTACK_HEDGE = os.getenv("AVIATIONSTACK_HEDGE", "false").lower() == "true"
+AVIATIONSTACK_HEDGE_MIN_SAMPLES = 20
+
+REGISTRY.register(CallbackMetric(
+    "flight_cache_events_total", "AviationStack result cache events", ("event",),
+    lambda: [((event,), FLIGHT_CACHE.stats()[event]) for event in ("hits", "stale_hits", "misses", "evictions")],
+    type="counter",
+))
+REGISTRY.register(CallbackMetric(
+    "flight_cache_entries", "Routes held in the AviationStack result cache", (),
+    lambda: [((), len(FLIGHT_CACHE))],
+))
+REGISTRY.register(CallbackMetric(
+    "upstream_circuit_open", "1 if the upstream circuit breaker is open", ("upstream",),
+    lambda: [(("aviationstack",), int(AVIATIONSTACK_BREAKER.state == "open"))],
+))
+REGISTRY.register(CallbackMetric(
+    "upstream_circuit_trips_total", "Times the upstream circuit breaker opened", ("upstream",),
+    lambda: [(("aviationstack",), AVIATIONSTACK_BREAKER.trips)],
+    type="counter",
+))
+
+async def fetch_aviationstack_flights(dep_iata, arr_iata):
+    """Fetch flights for a route from AviationStack (empty list if none)"""
+    params = {
+        "access_key": AVIATIONSTACK_API_KEY,
+        "dep_iata": dep_iata,
+        "arr_iata": arr_iata,
+        "limit": 10
+    }
+    client = get_http_client(AVIATIONSTACK_HOST)
+    started = time.monotonic()
+    with upstream_timer("aviationstack"):
+        response = await client.get(AVIATIONSTACK_URL, params=params)
+        response.raise_for_status()
+    AVIATIONSTACK_LATENCY.observe(time.monotonic() - started)
+    api_data = response.json()
+    if AVIATIONSTACK_DEBUG_SAMPLE_RATE and random.random() < AVIATIONSTACK_DEBUG_SAMPLE_RATE:
+        logger.debug("AviationStack API raw response: %s", api_data)
+    flights = []
+    for flight in api_data.get("data") or []:
+        flights.append({
+            "id": flight.get("flight", {}).get("iata", "N/A"),
+            "airline": flight.get("airline", {}).get("name", "N/A"),
+            "from_city": flight.get("departure", {}).get("iata", "N/A"),
+            "to_city": flight.get("arrival", {}).get("iata", "N/A"),
+            "depart_time": flight.get("departure", {}).get("scheduled", "N/A"),
+            "arrive_time": flight.get("arrival", {}).get("scheduled", "N/A"),
+            "price": Money.of(199, "USD"),  # Placeholder
+            "stops": 0  # Placeholder
+        })
+    return flights
+
+async def call_aviationstack(dep_iata, arr_iata):
+    """AviationStack call guarded by the circuit breaker and latency budget"""
+    hedge_after = None
+    if AVIATIONSTACK_HEDGE and len(AVIATIONSTACK_LATENCY) >= AVIATIONSTACK_HEDGE_MIN_SAMPLES:
+        hedge_after = AVIATIONSTACK_LATENCY.percentile(95)
+
+    async def attempt():
+        return await asyncio.wait_for(
+            hedged(fetch_aviationstack_flights, dep_iata, arr_iata, hedge_after=hedge_after),
+            AVIATIONSTACK_TIMEOUT
+        )
+    return await AVIATIONSTACK_BREAKER.call(attempt)
+
+async def load_route_flights(key, dep_iata, arr_iata):
+    """AviationStack flights for a route, cached from inside the shared single-flight call.
+
+    Callers may be cancelled (e.g. by the trip search deadline) while the
+    call keeps running; caching here keeps its result for the next search.
+    """
+    flights = await call_aviationstack(dep_iata, arr_iata)
+    FLIGHT_CACHE.set(key, flights)
+    return flights
+
+async def find_flights(from_city, to_city):
+    """Flights for a route: AviationStack (cached per route), else the local inventory.
+
+    Cities may be given by name, alias or IATA code ("Bengaluru", "BLR").
+    """
+    dep_iata = LOCATIONS.iata_code(from_city)
+    arr_iata = LOCATIONS.iata_code(to_city)
+    key = normalize_key(dep_iata, arr_iata)
+    try:
+        flights = await FLIGHT_CACHE.get_or_load(
+            key,
+            lambda: FLIGHT_SEARCHES.do(key, load_route_flights, key, dep_iata, arr_iata)
+        )
+    except Exception as api_error:
+        # Timeouts, upstream errors and an open breaker all degrade to the local inventory
+        logger.warning("AviationStack unavailable, serving fallback flights: %r", api_error)
+        flights = []
+    if not flights:
+        # If no data, fall back to the local inventory for this route
+        flights = FLIGHT_INVENTORY.lookup(dep_iata, arr_iata)
+    return flights
+
+def serialize_flight(flight):
+    """Format the Money price for the API response"""
+    return {**flight, "price": flight["price"].format()}
+
 @router.post("/search")
 async def search_flights(request: Request):
     try:
@@ -63,147 +200,48 @@ async def search_flights(request: Request):
         if not data.get("from") or not data.get("to"):
             raise HTTPException(status_code=400, detail="From and To locations are required")
         
-        # Try to get real flight data from AviationStack
-        try:
-            params = {
-                "access_key": AVIATIONSTACK_API_KEY,
-                "dep_iata": data["from"],
-                "arr_iata": data["to"],
-                "limit": 10
-            }
-            
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(AVIATIONSTACK_URL, params=params)
-                api_data = response.json()
-                print("AviationStack API raw response:", api_data)  # Debug print
-                if api_data.get("data") and api_data["data"]:
-                    flights = []
-                    for flight in api_data["data"]:
-                        flights.append({
-                            "id": flight.get("flight", {}).get("iata", "N/A"),
-                            "airline": flight.get("airline", {}).get("name", "N/A"),
-                            "from_city": flight.get("departure", {}).get("iata", "N/A"),
-                            "to_city": flight.get("arrival", {}).get("iata", "N/A"),
-                            "depart_time": flight.get("departure", {}).get("scheduled", "N/A"),
-                            "arrive_time": flight.get("arrival", {}).get("scheduled", "N/A"),
-                            "price": "$199",  # Placeholder
-                            "stops": 0  # Placeholder
-                        })
-                    return {"flights": flights}
-                # If no data, return mock flights
-                mock_flights = [
-                    # Major Indian routes
-                    {
-                        "id": "AI101",
-                        "airline": "Air India",
-                        "from_city": "DEL",
-                        "to_city": "BOM",
-                        "depart_time": "2025-08-01T08:00:00+05:30",
-                        "arrive_time": "2025-08-01T10:10:00+05:30",
-                        "price": "₹ 8,500",
-                        "stops": 0
-                    },
-                    {
-                        "id": "6E202",
-                        "airline": "IndiGo",
-                        "from_city": "BLR",
-                        "to_city": "HYD",
-                        "depart_time": "2025-08-02T09:30:00+05:30",
-                        "arrive_time": "2025-08-02T10:45:00+05:30",
-                        "price": "₹ 3,200",
-                        "stops": 0
-                    },
-                    {
-                        "id": "SG303",
-                        "airline": "SpiceJet",
-                        "from_city": "MAA",
-                        "to_city": "CCU",
-                        "depart_time": "2025-08-03T13:00:00+05:30",
-                        "arrive_time": "2025-08-03T15:30:00+05:30",
-                        "price": "₹ 5,000",
-                        "stops": 1
-                    },
-                    {
-                        "id": "UK404",
-                        "airline": "Vistara",
-                        "from_city": "DEL",
-                        "to_city": "GOI",
-                        "depart_time": "2025-08-04T07:00:00+05:30",
-                        "arrive_time": "2025-08-04T09:30:00+05:30",
-                        "price": "₹ 7,000",
-                        "stops": 0
-                    },
-                    # International routes
-                    {
-                        "id": "EK501",
-                        "airline": "Emirates",
-                        "from_city": "BOM",
-                        "to_city": "DXB",
-                        "depart_time": "2025-08-05T21:00:00+05:30",
-                        "arrive_time": "2025-08-05T23:00:00+04:00",
-                        "price": "₹ 32,000",
-                        "stops": 0
-                    },
-                    {
-                        "id": "BA142",
-                        "airline": "British Airways",
-                        "from_city": "DEL",
-                        "to_city": "LHR",
-                        "depart_time": "2025-08-06T03:30:00+05:30",
-                        "arrive_time": "2025-08-06T08:00:00+01:00",
-                        "price": "₹ 68,000",
-                        "stops": 0
-                    },
-                    {
-                        "id": "SQ423",
-                        "airline": "Singapore Airlines",
-                        "from_city": "BOM",
-                        "to_city": "SIN",
-                        "depart_time": "2025-08-07T23:55:00+05:30",
-                        "arrive_time": "2025-08-08T08:00:00+08:00",
-                        "price": "₹ 28,000",
-                        "stops": 0
-                    },
-                    {
-                        "id": "LH763",
-                        "airline": "Lufthansa",
-                        "from_city": "DEL",
-                        "to_city": "FRA",
-                        "depart_time": "2025-08-08T02:50:00+05:30",
-                        "arrive_time": "2025-08-08T07:30:00+02:00",
-                        "price": "₹ 75,000",
-                        "stops": 0
-                    },
-                    {
-                        "id": "UA83",
-                        "airline": "United Airlines",
-                        "from_city": "DEL",
-                        "to_city": "EWR",
-                        "depart_time": "2025-08-09T23:35:00+05:30",
-                        "arrive_time": "2025-08-10T05:00:00-04:00",
-                        "price": "₹ 90,000",
-                        "stops": 0
-                    },
-                    {
-                        "id": "QF68",
-                        "airline": "Qantas",
-                        "from_city": "DEL",
-                        "to_city": "MEL",
-                        "depart_time": "2025-08-10T18:00:00+05:30",
-                        "arrive_time": "2025-08-11T10:30:00+10:00",
-                        "price": "₹ 1,10,000",
-                        "stops": 1
-                    }
-                ]
-                return {"flights": mock_flights}
-        except Exception as api_error:
-            print(f"API Error: {api_error}")
-            raise HTTPException(status_code=502, detail="Failed to fetch flight data from AviationStack API.")
+        flights = await find_flights(data["from"], data["to"])
+        return {"flights": [serialize_flight(f) for f in flights]}
     except Exception as e:
         print(f"Flight search error: {e}")
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/search/stream")
+async def search_flights_stream(request: Request):
+    """Stream flight results as NDJSON (default) or SSE (?format=sse)"""
+    data = await request.json()
+    if not data.get("from") or not data.get("to"):
+        raise HTTPException(status_code=400, detail="From and To locations are required")
+    flights = await find_flights(data["from"], data["to"])
+    return stream_results(request, flights, serialize_flight)
+
+@router.post("/search/batch")
+async def search_flights_batch(request: Request):
+    """Search many routes in one request.
+
+    Body: {"queries": [{"from": ..., "to": ...}, ...]}. Routes that are the
+    same after city/IATA normalization are searched once, a few at a time,
+    through the same cache and connection pool as /search. Results are keyed
+    "FROM-TO"; `queries` lists the key of each input query in order.
+    """
+    data = await request.json()
+    try:
+        queries = batch_queries(data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    keys = []
+    calls = []
+    for i, query in enumerate(queries):
+        if not query.get("from") or not query.get("to"):
+            raise HTTPException(status_code=400, detail=f"Query {i}: From and To locations are required")
+        dep_iata = LOCATIONS.iata_code(query["from"])
+        arr_iata = LOCATIONS.iata_code(query["to"])
+        key = f"{dep_iata}-{arr_iata}"
+        keys.append(key)
+        calls.append((key, lambda dep_iata=dep_iata, arr_iata=arr_iata: find_flights(dep_iata, arr_iata)))
+    return batch_response(keys, await run_batch(calls), serialize_flight)
+
 def get_mock_flights(from_city, to_city):
     """Generate mock flight data based on the search criteria"""
     mock_flights = []
@@ -228,7 +266,7 @@ def get_mock_flights(from_city, to_city):
             "to_city": to_city,
             "depart_time": depart_time,
             "arrive_time": arrive_time,
-            "price": f"${random.randint(80, 300)}",
+            "price": Money.of(random.randint(80, 300), "USD"),
             "stops": random.choice([0, 0, 0, 1, 1, 2])  # Mostly direct flights
         }
         mock_flights.append(flight)
@@ -247,7 +285,7 @@ async def test_flight_search():
         return {
             "status": "success",
             "message": "Flight search is working!",
-            "test_results": results
+            "test_results": [serialize_flight(f) for f in results]
         }
     except Exception as e:
         return {
@@ -255,6 +293,22 @@ async def test_flight_search():
             "message": f"Flight search test failed: {str(e)}"
         }
 
+@router.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss/eviction counters for the AviationStack result cache"""
+    return {**FLIGHT_CACHE.stats(), "single_flight": FLIGHT_SEARCHES.stats()}
+
+@router.get("/upstream/status")
+async def upstream_status():
+    """AviationStack circuit breaker state, trip counts and latency"""
+    return {
+        **AVIATIONSTACK_BREAKER.stats(),
+        "timeout": AVIATIONSTACK_TIMEOUT,
+        "hedging": AVIATIONSTACK_HEDGE,
+        "latency_p50": AVIATIONSTACK_LATENCY.percentile(50),
+        "latency_p95": AVIATIONSTACK_LATENCY.percentile(95),
+    }
+
 @router.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "flights"} 
\ No newline at end of file
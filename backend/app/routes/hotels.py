@@ -1,6 +1,18 @@
-from fastapi import APIRouter, HTTPException, Request
-import random
+from fastapi import APIRouter, HTTPException, Request, Response
+from starlette.concurrency import run_in_threadpool
+import os
 import traceback
+from functools import lru_cache
+from ..services.singleflight import SingleFlight, normalize_key
+from ..services.money import Money
+from ..services.streaming import stream_results
+from ..services.seeding import seeded_random
+from ..services.catalog import get_catalog
+from ..services.hotel_index import HotelFilters, HotelIndex, SORT_KEYS, DEFAULT_ORDER
+from ..services.pagination import encode_cursor, decode_cursor
+from ..services.amenities import HOTEL_AMENITIES, HOTEL_AMENITY_VOCAB, name_list
+from ..services.locations import LOCATIONS
+from ..services.batch import batch_queries, batch_response, run_batch
 
 router = APIRouter(prefix="/hotels", tags=["hotels"])
 
@@ -44,8 +56,26 @@ HOTEL_TYPES = [
     "Hotel", "Resort", "Inn", "Lodge", "Suites", "Plaza", "Tower", "Palace"
 ]
 
+CITY_HOTEL_STREETS = ['Main St', 'Park Ave', 'Broadway', 'Central Rd', 'Queen St']
+GENERIC_HOTEL_STREETS = ['Main St', 'Oak Ave', 'Park Blvd', 'Central Rd']
+
+# Concurrent identical searches share one generation run
+HOTEL_SEARCHES = SingleFlight()
+# Number of distinct searches whose generated results are memoized
+HOTEL_RESULT_CACHE_SIZE = int(os.getenv("HOTEL_RESULT_CACHE_SIZE", "512"))
+# Largest page a client may request, and the page size for catalog cities
+HOTEL_PAGE_SIZE_MAX = int(os.getenv("HOTEL_PAGE_SIZE_MAX", "200"))
+HOTEL_CATALOG_PAGE_SIZE = 50
+
 @router.post("/search")
-async def search_hotels(request: Request):
+async def search_hotels(request: Request, response: Response):
+    """Search hotels in a city.
+
+    Optional body fields: minPrice/maxPrice (per night, in rupees), minRating,
+    stars (int or list), amenities (list), sort (price|rating|stars), order
+    (asc|desc), limit and cursor. When more results remain, the cursor for
+    the next page is returned in the X-Next-Cursor header.
+    """
     try:
         data = await request.json()
         
@@ -53,80 +83,227 @@ async def search_hotels(request: Request):
         if not data.get("location"):
             raise HTTPException(status_code=400, detail="Location is required")
         
-        location = data.get("location", "Unknown City")
+        # Map aliases and near-miss spellings ("Bengaluru", "Mumbay") onto known cities
+        location = LOCATIONS.canonical_name(data.get("location", "Unknown City"))
         check_in = data.get("checkIn", "2024-01-01")
         check_out = data.get("checkOut", "2024-01-02")
         guests = int(data.get("guests", 1))
         rooms = int(data.get("rooms", 1))
         
-        # Generate expanded mock hotel data
-        hotels = generate_expanded_mock_hotels(location, guests, rooms)
-        return hotels
+        try:
+            filters, sort, order, position, limit = parse_hotel_query(data)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
+        # Page through the pre-sorted index for this search
+        hotels, next_position = await page_hotels(
+            location, guests, rooms, check_in, check_out, filters, sort, order, position, limit
+        )
+        if next_position is not None:
+            response.headers["X-Next-Cursor"] = encode_cursor({"sort": sort, "order": order, "pos": next_position})
+        return [serialize_hotel(h) for h in hotels]
+        
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Hotel search error: {e}")
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
-def generate_expanded_mock_hotels(location, guests, rooms):
-    """Generate expanded mock hotel data based on search criteria and city"""
-    hotels = []
+@router.post("/search/stream")
+async def search_hotels_stream(request: Request):
+    """Stream the hotels /search would return as NDJSON (default) or SSE (?format=sse)"""
+    data = await request.json()
+    if not data.get("location"):
+        raise HTTPException(status_code=400, detail="Location is required")
+    # Same source as /search: the bulk catalog when it covers the city, else the mock data
+    items = await find_hotels(
+        data["location"], int(data.get("guests", 1)), int(data.get("rooms", 1)),
+        data.get("checkIn", "2024-01-01"), data.get("checkOut", "2024-01-02")
+    )
+    return stream_results(request, items, serialize_hotel)
+
+@router.post("/search/batch")
+async def search_hotels_batch(request: Request):
+    """Search many cities/stays in one request.
+
+    Body: {"queries": [{"location", "checkIn", "checkOut", "guests", "rooms"}, ...]}.
+    Identical stays are searched once, a few at a time, sharing the search
+    caches. Results are keyed "location|checkIn|checkOut|guests|rooms";
+    `queries` lists the key of each input query in order.
+    """
+    data = await request.json()
+    try:
+        queries = batch_queries(data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    keys = []
+    calls = []
+    for i, query in enumerate(queries):
+        if not query.get("location"):
+            raise HTTPException(status_code=400, detail=f"Query {i}: Location is required")
+        stay = (
+            LOCATIONS.canonical_name(query["location"]),
+            query.get("checkIn", "2024-01-01"),
+            query.get("checkOut", "2024-01-02"),
+            int(query.get("guests", 1)),
+            int(query.get("rooms", 1)),
+        )
+        key = "|".join(str(part) for part in stay)
+        keys.append(key)
+        calls.append((key, lambda stay=stay: find_hotels(stay[0], stay[3], stay[4], stay[1], stay[2])))
+    return batch_response(keys, await run_batch(calls), serialize_hotel)
+
+async def find_hotels(location, guests=1, rooms=1, check_in=None, check_out=None):
+    """Hotels for a city sorted by price; concurrent identical searches share one run"""
+    location = LOCATIONS.canonical_name(location)
+    return await HOTEL_SEARCHES.do(
+        normalize_key(location, check_in, check_out, guests, rooms),
+        run_in_threadpool, load_hotels, location, guests, rooms, check_in, check_out
+    )
+
+def parse_hotel_query(data):
+    """Filters, sort, order, start position and limit from a search body"""
+    def optional(key, cast):
+        value = data.get(key)
+        return None if value in (None, "") else cast(value)
+
+    min_price = optional("minPrice", float)
+    max_price = optional("maxPrice", float)
+    stars = data.get("stars")
+    amenities = name_list(data.get("amenities"))
+    filters = HotelFilters(
+        min_price=Money.of(min_price).minor if min_price is not None else None,
+        max_price=Money.of(max_price).minor if max_price is not None else None,
+        min_rating=optional("minRating", float),
+        stars=[int(s) for s in (stars if isinstance(stars, list) else [stars])] if stars else None,
+        amenities=amenities
+    )
+
+    sort = data.get("sort") or "price"
+    if sort not in SORT_KEYS:
+        raise ValueError(f"sort must be one of: {', '.join(SORT_KEYS)}")
+    order = data.get("order") or DEFAULT_ORDER[sort]
+    if order not in ("asc", "desc"):
+        raise ValueError("order must be asc or desc")
+
+    limit = optional("limit", int)
+    if limit is not None:
+        if limit < 1:
+            raise ValueError("limit must be positive")
+        limit = min(limit, HOTEL_PAGE_SIZE_MAX)
+
+    position = 0
+    if data.get("cursor"):
+        cursor = decode_cursor(data["cursor"])
+        if cursor.get("sort") != sort or cursor.get("order") != order:
+            raise ValueError("cursor does not match the requested sort order")
+        position = int(cursor.get("pos", 0))
+    return filters, sort, order, position, limit
+
+@lru_cache(maxsize=HOTEL_RESULT_CACHE_SIZE)
+def hotel_index(location, guests, rooms, check_in=None, check_out=None):
+    """Sorted indexes over one memoized mock result set"""
+    return HotelIndex(generate_expanded_mock_hotels(location, guests, rooms, check_in, check_out), HOTEL_AMENITY_VOCAB)
+
+async def page_hotels(location, guests, rooms, check_in, check_out, filters, sort, order, position, limit):
+    """Return (hotels, next_position) from the catalog or the indexed mock data.
+
+    Concurrent identical searches that miss the index cache share one build.
+    """
+    catalog = get_catalog()
+    if catalog and catalog.hotels and catalog.hotels.has_city(location):
+        return await run_in_threadpool(
+            catalog.hotels.page,
+            location, guests, rooms, filters, sort, order, position, limit or HOTEL_CATALOG_PAGE_SIZE
+        )
+    index = await HOTEL_SEARCHES.do(
+        # Same key as find_hotels, in its own namespace since the result is an index, not a list
+        ("index",) + normalize_key(location, check_in, check_out, guests, rooms),
+        run_in_threadpool, hotel_index, location, guests, rooms, check_in, check_out
+    )
+    return index.page(filters, sort, order, position, limit)
+
+def load_hotels(location, guests, rooms, check_in=None, check_out=None):
+    """Hotels from the bulk catalog when it covers the city, else the expanded mock data"""
+    catalog = get_catalog()
+    if catalog and catalog.hotels and catalog.hotels.has_city(location):
+        return catalog.hotels.search(location, guests, rooms)
+    return generate_expanded_mock_hotels(location, guests, rooms, check_in, check_out)
+
+def iter_mock_hotels(location, guests, rooms, check_in=None, check_out=None):
+    """Yield mock hotels for a city one at a time, in generation order.
+
+    Generation is seeded from the search parameters, so an identical search
+    always yields the same hotels and prices.
+    """
+    rng = seeded_random("hotels", location, check_in, check_out, guests, rooms)
+    count = 0
     city_key = location.strip().lower()
     city_hotels = CITY_HOTELS.get(city_key, [])
     
     # Add city-specific hotels if available
     for i, hotel_name in enumerate(city_hotels):
-        base_price = random.randint(120, 400)
+        base_price = rng.randint(120, 400)
         total_price = base_price * guests * rooms
-        hotels.append({
+        count += 1
+        yield {
             "id": f"{city_key}_hotel_{i+1}",
             "name": hotel_name,
             "location": location,
-            "address": f"{random.randint(100, 999)} {random.choice(['Main St', 'Park Ave', 'Broadway', 'Central Rd', 'Queen St'])}, {location}",
-            "price_per_night": f"₹ {base_price * 80}",
-            "total_price": f"₹ {total_price * 80}",
-            "rating": round(random.uniform(3.5, 5.0), 1),
-            "amenities": random.sample([
-                "Free WiFi", "Pool", "Gym", "Restaurant", "Spa", 
-                "Business Center", "Free Breakfast", "Parking", "Room Service"
-            ], random.randint(3, 6)),
-            "stars": random.randint(3, 5),
+            "address": f"{rng.randint(100, 999)} {rng.choice(CITY_HOTEL_STREETS)}, {location}",
+            "price_per_night": Money.of(base_price * 80),
+            "total_price": Money.of(total_price * 80),
+            "rating": round(rng.uniform(3.5, 5.0), 1),
+            "amenity_mask": HOTEL_AMENITY_VOCAB.mask(rng.sample(HOTEL_AMENITIES, rng.randint(3, 6))),
+            "stars": rng.randint(3, 5),
             "image": f"https://via.placeholder.com/300x200/2563eb/ffffff?text={hotel_name.replace(' ', '+')}"
-        })
+        }
     
     # If not enough city-specific hotels, add generic ones
     n_needed = max(10, len(city_hotels))
-    while len(hotels) < n_needed:
-        chain = random.choice(HOTEL_CHAINS)
-        hotel_type = random.choice(HOTEL_TYPES)
+    while count < n_needed:
+        chain = rng.choice(HOTEL_CHAINS)
+        hotel_type = rng.choice(HOTEL_TYPES)
         hotel_name = f"{chain} {hotel_type}"
-        base_price = random.randint(80, 300)
+        base_price = rng.randint(80, 300)
         if "Marriott" in hotel_name or "Hilton" in hotel_name:
-            base_price = random.randint(150, 400)
+            base_price = rng.randint(150, 400)
         elif "Best Western" in hotel_name or "Comfort" in hotel_name:
-            base_price = random.randint(60, 150)
+            base_price = rng.randint(60, 150)
         total_price = base_price * guests * rooms
-        hotels.append({
-            "id": f"{city_key}_generic_{len(hotels)+1}",
+        count += 1
+        yield {
+            "id": f"{city_key}_generic_{count}",
             "name": hotel_name,
             "location": location,
-            "address": f"{random.randint(100, 999)} {random.choice(['Main St', 'Oak Ave', 'Park Blvd', 'Central Rd'])}, {location}",
-            "price_per_night": f"₹ {base_price * 80}",
-            "total_price": f"₹ {total_price * 80}",
-            "rating": round(random.uniform(3.5, 5.0), 1),
-            "amenities": random.sample([
-                "Free WiFi", "Pool", "Gym", "Restaurant", "Spa", 
-                "Business Center", "Free Breakfast", "Parking", "Room Service"
-            ], random.randint(3, 6)),
-            "stars": random.randint(3, 5),
+            "address": f"{rng.randint(100, 999)} {rng.choice(GENERIC_HOTEL_STREETS)}, {location}",
+            "price_per_night": Money.of(base_price * 80),
+            "total_price": Money.of(total_price * 80),
+            "rating": round(rng.uniform(3.5, 5.0), 1),
+            "amenity_mask": HOTEL_AMENITY_VOCAB.mask(rng.sample(HOTEL_AMENITIES, rng.randint(3, 6))),
+            "stars": rng.randint(3, 5),
             "image": f"https://via.placeholder.com/300x200/2563eb/ffffff?text={hotel_name.replace(' ', '+')}"
-        })
-    
+        }
+
+@lru_cache(maxsize=HOTEL_RESULT_CACHE_SIZE)
+def generate_expanded_mock_hotels(location, guests, rooms, check_in=None, check_out=None):
+    """Generate expanded mock hotel data based on search criteria and city.
+
+    Results are memoized; the returned tuple is shared and must not be mutated.
+    """
+    hotels = list(iter_mock_hotels(location, guests, rooms, check_in, check_out))
     # Sort by price (lowest first)
-    def parse_price(price_str):
-        return int(price_str.replace('₹', '').replace(' ', '').replace(',', ''))
-    hotels.sort(key=lambda x: parse_price(x["price_per_night"]))
-    return hotels
+    hotels.sort(key=lambda x: x["price_per_night"].minor)
+    return tuple(hotels)
+
+def serialize_hotel(hotel, vocabulary=HOTEL_AMENITY_VOCAB):
+    """Format the Money prices and amenity mask for the API response"""
+    result = {key: value for key, value in hotel.items() if key != "amenity_mask"}
+    result["price_per_night"] = hotel["price_per_night"].format()
+    result["total_price"] = hotel["total_price"].format()
+    result["amenities"] = list(vocabulary.names_of(hotel["amenity_mask"]))
+    return result
 
 @router.get("/health")
 async def health_check():
@@ -0,0 +1,24 @@
+from fastapi import APIRouter
+from ..services.locations import LOCATIONS
+
+router = APIRouter(prefix="/locations", tags=["locations"])
+
+# Upper bound on suggestions returned for one prefix
+SUGGEST_LIMIT_MAX = 20
+
+@router.get("/suggest")
+def suggest_locations(q: str = "", limit: int = 8):
+    """Cities and airports whose name, alias or IATA code starts with `q`"""
+    limit = max(1, min(limit, SUGGEST_LIMIT_MAX))
+    return {
+        "query": q,
+        "suggestions": [
+            {
+                "name": location["name"],
+                "iata": location.get("iata"),
+                "country": location.get("country"),
+                "matched": location["matched"]
+            }
+            for location in LOCATIONS.suggest(q, limit)
+        ]
+    }
@@ -1,7 +1,19 @@
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
 import razorpay
+import datetime
 import os
 import json
+import time
+from ..auth import get_current_user
+from ..database import AsyncSessionLocal
+from ..models import IdempotentOrder, UserOut
+from ..services.metrics import upstream_timer
+from ..services.idempotency import (
+    IdempotencyStore, IdempotencyConflict, IdempotencyInProgress, idempotency_cutoff, idempotency_key, fingerprint
+)
 
 router = APIRouter(prefix="/payments", tags=["payments"])
 
@@ -10,11 +22,121 @@ RAZORPAY_KEY_SECRET = os.getenv("RAZORPAY_KEY_SECRET")
 
 client = razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))
 
+# Retried order requests with the same Idempotency-Key return the first Razorpay order
+ORDER_IDEMPOTENCY = IdempotencyStore()
+# A claimed key whose order was never recorded (the worker died) may be taken over after this (seconds)
+ORDER_CLAIM_TIMEOUT = float(os.getenv("ORDER_CLAIM_TIMEOUT", "300"))
+# Expired order keys are deleted by the first claim after this many seconds
+ORDER_KEY_PURGE_INTERVAL = float(os.getenv("ORDER_KEY_PURGE_INTERVAL", "3600"))
+_last_order_key_purge = None
+
 @router.post("/create-order")
-async def create_order(request: Request):
+async def create_order(request: Request, response: Response, user: UserOut = Depends(get_current_user)):
+    """Create a Razorpay order.
+
+    With an Idempotency-Key header, a retry of the same request returns the
+    order created the first time (marked Idempotent-Replayed: true) and a
+    concurrent duplicate waits for it instead of creating a second order.
+    Keys are claimed in the database before the order is created, so a
+    duplicate on another worker gets the stored order, or 409 while the
+    first request is still running.
+    """
+    data = await request.json()
+    try:
+        key = idempotency_key(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if key is None:
+        return await place_order(data, user.id)
+    request_fingerprint = fingerprint(data)
+    try:
+        (result, stored), replayed = await ORDER_IDEMPOTENCY.run(
+            f"{user.id}:{key}", request_fingerprint,
+            lambda: place_order_once(data, user.id, key, request_fingerprint)
+        )
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except IdempotencyInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e), headers={"Retry-After": "1"})
+    if replayed or stored:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+def order_key(user_id, key):
+    return (IdempotentOrder.user_id == user_id, IdempotentOrder.idempotency_key == key)
+
+async def purge_expired_order_keys(db):
+    """Delete order keys older than IDEMPOTENCY_TTL, at most once per ORDER_KEY_PURGE_INTERVAL"""
+    global _last_order_key_purge
+    if _last_order_key_purge is not None and time.monotonic() - _last_order_key_purge < ORDER_KEY_PURGE_INTERVAL:
+        return
+    _last_order_key_purge = time.monotonic()
+    await db.execute(delete(IdempotentOrder).where(IdempotentOrder.created_at < idempotency_cutoff()))
+    await db.commit()
+
+async def claim_order_key(db, user_id, key, request_fingerprint):
+    """Claim `key` for this request; returns the stored response if the key already has one"""
+    for attempt in range(2):
+        db.add(IdempotentOrder(user_id=user_id, idempotency_key=key, request_fingerprint=request_fingerprint))
+        try:
+            await db.commit()
+            return None
+        except IntegrityError:
+            await db.rollback()
+        db.expunge_all()
+        claim = await db.get(IdempotentOrder, (user_id, key))
+        if claim is None:
+            # Released (the first request failed) since the insert: claim it again
+            continue
+        if claim.created_at < idempotency_cutoff():
+            # Expired: forget it, unless another request already replaced it
+            await db.execute(delete(IdempotentOrder).where(
+                *order_key(user_id, key), IdempotentOrder.created_at == claim.created_at
+            ))
+            await db.commit()
+            continue
+        if claim.request_fingerprint != request_fingerprint:
+            raise IdempotencyConflict("Idempotency-Key was already used with a different request")
+        if claim.response is not None:
+            return json.loads(claim.response)
+        # Unfinished claim: take it over only if it is abandoned, and only if no other request did first
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=ORDER_CLAIM_TIMEOUT)
+        taken = await db.execute(
+            update(IdempotentOrder)
+            .where(*order_key(user_id, key), IdempotentOrder.response.is_(None), IdempotentOrder.created_at < cutoff)
+            .values(created_at=datetime.datetime.utcnow())
+        )
+        await db.commit()
+        if not taken.rowcount:
+            break
+        return None
+    raise IdempotencyInProgress("A request with this Idempotency-Key is still being processed")
+
+async def place_order_once(data, user_id, key, request_fingerprint):
+    """Create the order for an Idempotency-Key at most once across workers; returns (result, replayed)"""
+    async with AsyncSessionLocal() as db:
+        await purge_expired_order_keys(db)
+        stored = await claim_order_key(db, user_id, key, request_fingerprint)
+        if stored is not None:
+            return stored, True
+        try:
+            result = await place_order(data, user_id)
+        except Exception:
+            # Release the claim so the request can be retried with the same key
+            await db.execute(delete(IdempotentOrder).where(*order_key(user_id, key), IdempotentOrder.response.is_(None)))
+            await db.commit()
+            raise
+        # merge: the claim row may have been purged or taken over meanwhile
+        await db.merge(IdempotentOrder(
+            user_id=user_id, idempotency_key=key, request_fingerprint=request_fingerprint,
+            order_id=str(result["order"].get("id", "")), response=json.dumps(result)
+        ))
+        await db.commit()
+        return result, False
+
+async def place_order(data, user_id):
+    """Create the Razorpay order described by a create-order body"""
     try:
-        data = await request.json()
-        
         # Extract booking details
         booking_type = data.get("booking_type", "flight")  # flight, hotel, transport
         item_data = data.get("item", {})
@@ -26,19 +148,21 @@ async def create_order(request: Request):
         
         # Create order notes with booking details
         notes = {
+            "user_id": str(user_id),
             "booking_type": booking_type,
             "item_id": item_data.get("id", ""),
             "item_name": item_data.get("name", ""),
             "item_details": json.dumps(item_data)
         }
         
-        # Create Razorpay order
-        order = client.order.create({
-            "amount": amount_in_paise,
-            "currency": currency,
-            "payment_capture": 1,
-            "notes": notes
-        })
+        # Create Razorpay order (the SDK is blocking, so keep it off the event loop)
+        with upstream_timer("razorpay"):
+            order = await run_in_threadpool(client.order.create, {
+                "amount": amount_in_paise,
+                "currency": currency,
+                "payment_capture": 1,
+                "notes": notes
+            })
         
         return {
             "order": order,
@@ -52,7 +176,7 @@ async def create_order(request: Request):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/verify-payment")
-async def verify_payment(request: Request):
+async def verify_payment(request: Request, user: UserOut = Depends(get_current_user)):
     try:
         data = await request.json()
         
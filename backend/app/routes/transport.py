@@ -1,21 +1,31 @@
-from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from starlette.concurrency import run_in_threadpool
 import random
 import traceback
 import os
-import httpx
-from fastapi.responses import RedirectResponse, JSONResponse
+from functools import lru_cache
+from datetime import timedelta
+from fastapi.responses import JSONResponse
 from urllib.parse import urlencode
+from ..auth import create_access_token, decode_access_token, get_current_user
+from ..models import UserOut
+from ..services.singleflight import SingleFlight, normalize_key
+from ..services.money import Money
+from ..services.streaming import stream_results
+from ..services.seeding import seeded_random
+from ..services.catalog import get_catalog
+from ..services.amenities import TRANSPORT_FEATURE_VOCAB, has_all
+from ..services.fares import FARES
+from ..services.uber_tokens import (
+    UBER_CLIENT_ID, UBER_REDIRECT_URI, UberTokenError, exchange_code, get_uber_token
+)
 
 router = APIRouter(prefix="/transport", tags=["transport"])
 
-# Uber API credentials from .env
-UBER_CLIENT_ID = os.getenv("UBER_CLIENT_ID")
-UBER_CLIENT_SECRET = os.getenv("UBER_CLIENT_SECRET")
-UBER_REDIRECT_URI = os.getenv("UBER_REDIRECT_URI", "http://localhost:8000/api/transport/uber/callback")
+# Uber API credentials from .env are read by services/uber_tokens.py
 UBER_SANDBOX_MODE = os.getenv("UBER_SANDBOX_MODE", "true").lower() == "true"
-
-# In-memory token store for demo (use DB/session in production)
-UBER_ACCESS_TOKEN = None
+# The OAuth state carries the user id, signed, for this long
+UBER_STATE_EXPIRE_MINUTES = 10
 
 # Mock transport data
 TRANSPORT_PROVIDERS = {
@@ -25,6 +35,51 @@ TRANSPORT_PROVIDERS = {
     "shuttle": ["Airport Shuttle", "Hotel Shuttle", "City Shuttle", "Express Shuttle"]
 }
 
+TRANSPORT_TYPES = ["taxi", "uber", "limo", "shuttle"]
+
+# Providers used by the expanded mock data and the bulk catalog generator
+RIDE_PROVIDERS = {
+    "taxi": [
+        "Yellow Cab", "City Taxi", "Express Taxi", "Metro Taxi", "FastTrack Taxi", "Prime Taxi", "Silver Cab", "BlueLine Taxi", "Star Taxi", "Ace Taxi",
+        "QuickRide Taxi", "GoTaxi", "Rapid Taxi", "Classic Cab", "Elite Taxi"
+    ],
+    "uber": [
+        "UberX", "UberXL", "Uber Black", "Uber SUV", "Uber Go", "Uber Premier", "Uber Pool", "Uber Intercity", "Uber Moto", "Uber Auto",
+        "Uber Comfort", "Uber Green", "Uber WAV", "Uber Select", "Uber Lux"
+    ],
+    "limo": ["Luxury Limo", "Executive Limo", "Premium Limo", "VIP Limo"],
+    "shuttle": ["Airport Shuttle", "Hotel Shuttle", "City Shuttle", "Express Shuttle"]
+}
+
+# Base fare range (USD, inclusive) per transport type, used by the bulk catalog generator
+RIDE_BASE_PRICES = {
+    "taxi": (20, 50),
+    "uber": (25, 60),
+    "limo": (80, 150),
+    "shuttle": (15, 40)
+}
+
+VEHICLE_TYPES = {
+    "taxi": ["Sedan", "SUV", "Van"],
+    "uber": ["UberX", "UberXL", "Uber Black", "Uber SUV"],
+    "limo": ["Luxury Sedan", "Stretch Limo", "SUV Limo"],
+    "shuttle": ["Van", "Bus", "Minibus"]
+}
+
+BASE_FEATURES = ["AC", "WiFi", "GPS", "Child Seat", "Wheelchair Access", "Luggage Space"]
+# Feature pool and number of features drawn per transport type
+TYPE_FEATURES = {
+    "taxi": (BASE_FEATURES, 2),
+    "uber": (BASE_FEATURES, 3),
+    "limo": (BASE_FEATURES + ["Champagne", "Professional Driver", "Leather Seats"], 4),
+    "shuttle": (BASE_FEATURES + ["Multiple Stops"], 3)
+}
+
+# Concurrent identical searches share one generation run
+TRANSPORT_SEARCHES = SingleFlight()
+# Number of distinct searches whose generated results are memoized
+TRANSPORT_RESULT_CACHE_SIZE = int(os.getenv("TRANSPORT_RESULT_CACHE_SIZE", "512"))
+
 @router.post("/search")
 async def search_transport(request: Request):
     try:
@@ -36,77 +91,102 @@ async def search_transport(request: Request):
         dropoff = data.get("dropoff", "Unknown Location")
         transport_type = data.get("type", "taxi")
         # Always use expanded mock data
-        transports = generate_expanded_mock_transports(pickup, dropoff, transport_type)
-        return transports
+        features = TRANSPORT_FEATURE_VOCAB.mask(data.get("features"))
+        transports = await find_transports(pickup, dropoff, transport_type, features)
+        return [serialize_transport(t) for t in transports]
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Transport search error: {e}")
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
-def generate_expanded_mock_transports(pickup, dropoff, transport_type):
-    """Generate more diverse mock transport data with more taxi and Uber options."""
-    transports = []
-    taxi_names = [
-        "Yellow Cab", "City Taxi", "Express Taxi", "Metro Taxi", "FastTrack Taxi", "Prime Taxi", "Silver Cab", "BlueLine Taxi", "Star Taxi", "Ace Taxi",
-        "QuickRide Taxi", "GoTaxi", "Rapid Taxi", "Classic Cab", "Elite Taxi"
-    ]
-    uber_names = [
-        "UberX", "UberXL", "Uber Black", "Uber SUV", "Uber Go", "Uber Premier", "Uber Pool", "Uber Intercity", "Uber Moto", "Uber Auto",
-        "Uber Comfort", "Uber Green", "Uber WAV", "Uber Select", "Uber Lux"
-    ]
-    providers = {
-        "taxi": taxi_names,
-        "uber": uber_names,
-        "limo": ["Luxury Limo", "Executive Limo", "Premium Limo", "VIP Limo"],
-        "shuttle": ["Airport Shuttle", "Hotel Shuttle", "City Shuttle", "Express Shuttle"]
-    }
-    all_types = ["taxi", "uber", "limo", "shuttle"]
-    for i in range(random.randint(10, 16)):
+@router.post("/search/stream")
+async def search_transport_stream(request: Request):
+    """Stream the transport options /search would return as NDJSON (default) or SSE (?format=sse)"""
+    data = await request.json()
+    if not data.get("pickup") or not data.get("dropoff"):
+        raise HTTPException(status_code=400, detail="Pickup and dropoff locations are required")
+    # Same source as /search: the bulk catalog when one is loaded, else the mock data
+    features = TRANSPORT_FEATURE_VOCAB.mask(data.get("features"))
+    items = await find_transports(data["pickup"], data["dropoff"], data.get("type", "taxi"), features)
+    return stream_results(request, items, serialize_transport)
+
+async def find_transports(pickup, dropoff, transport_type="taxi", features=0):
+    """Transport options sorted by price, having every feature in the `features` mask.
+
+    Concurrent identical searches share one run.
+    """
+    return await TRANSPORT_SEARCHES.do(
+        normalize_key(pickup, dropoff, transport_type, features),
+        run_in_threadpool, load_transports, pickup, dropoff, transport_type, features
+    )
+
+def load_transports(pickup, dropoff, transport_type, features=0):
+    """Rides from the bulk catalog when one is loaded, else the expanded mock data"""
+    catalog = get_catalog()
+    if catalog and catalog.rides:
+        return catalog.rides.search(pickup, dropoff, transport_type, get_capacity, features=features)
+    transports = generate_expanded_mock_transports(pickup, dropoff, transport_type)
+    if features:
+        transports = [t for t in transports if has_all(t["feature_mask"], features)]
+    return transports
+
+def iter_mock_transports(pickup, dropoff, transport_type):
+    """Yield mock transport options one at a time, in generation order.
+
+    Generation is seeded from the search parameters, so an identical search
+    always yields the same options. Prices and durations come from the fare
+    engine's distance-based quote for each vehicle class, varied per provider.
+    """
+    rng = seeded_random("transport", pickup, dropoff, transport_type)
+    for i in range(rng.randint(10, 16)):
         if transport_type == "all":
-            current_type = random.choice(all_types)
+            current_type = rng.choice(TRANSPORT_TYPES)
         else:
-            current_type = transport_type if i % 2 == 0 else random.choice(all_types)
-        provider = random.choice(providers.get(current_type, ["Generic Transport"]))
-        base_price = 20
-        if current_type == "limo":
-            base_price = random.randint(80, 150)
-        elif current_type == "uber":
-            base_price = random.randint(25, 60)
-        elif current_type == "shuttle":
-            base_price = random.randint(15, 40)
-        else:  # taxi
-            base_price = random.randint(20, 50)
-        final_price = base_price + random.randint(-5, 10)
-        final_price = max(10, final_price)
-        inr_price = final_price * 80
-        duration = random.randint(15, 60)
+            current_type = transport_type if i % 2 == 0 else rng.choice(TRANSPORT_TYPES)
+        provider = rng.choice(RIDE_PROVIDERS.get(current_type, ["Generic Transport"]))
+        quote = FARES.quote(pickup, dropoff, current_type)
+        # Providers price the same trip within a band around the tariff
+        price = Money.of(round(quote.fare.amount * rng.uniform(0.9, 1.2)))
+        duration = quote.minutes
         transport = {
             "id": f"{current_type}_{i+1}",
             "type": current_type,
             "provider": provider,
             "pickup": pickup,
             "dropoff": dropoff,
-            "price": f"₹{inr_price}",
+            "price": price,
+            "distance": f"{quote.distance_km} km",
             "duration": f"{duration} min",
             "estimated_arrival": f"{duration} min",
-            "vehicle_type": get_vehicle_type(current_type),
+            "vehicle_type": get_vehicle_type(current_type, rng),
             "capacity": get_capacity(current_type),
-            "features": get_transport_features(current_type),
+            "feature_mask": get_transport_features(current_type, rng),
             "image": f"https://via.placeholder.com/300x200/10b981/ffffff?text={provider.replace(' ', '+')}"
         }
-        transports.append(transport)
-    transports.sort(key=lambda x: int(x["price"].replace("₹", "")))
-    return transports
+        yield transport
+
+@lru_cache(maxsize=TRANSPORT_RESULT_CACHE_SIZE)
+def generate_expanded_mock_transports(pickup, dropoff, transport_type):
+    """Generate more diverse mock transport data with more taxi and Uber options.
 
-def get_vehicle_type(transport_type):
+    Results are memoized; the returned tuple is shared and must not be mutated.
+    """
+    transports = list(iter_mock_transports(pickup, dropoff, transport_type))
+    transports.sort(key=lambda x: x["price"].minor)
+    return tuple(transports)
+
+def serialize_transport(transport, vocabulary=TRANSPORT_FEATURE_VOCAB):
+    """Format the Money price and expand the feature mask for the API response"""
+    result = {key: value for key, value in transport.items() if key != "feature_mask"}
+    result["price"] = transport["price"].format()
+    result["features"] = list(vocabulary.names_of(transport["feature_mask"]))
+    return result
+
+def get_vehicle_type(transport_type, rng=random):
     """Get vehicle type based on transport type"""
-    vehicle_types = {
-        "taxi": ["Sedan", "SUV", "Van"],
-        "uber": ["UberX", "UberXL", "Uber Black", "Uber SUV"],
-        "limo": ["Luxury Sedan", "Stretch Limo", "SUV Limo"],
-        "shuttle": ["Van", "Bus", "Minibus"]
-    }
-    return random.choice(vehicle_types.get(transport_type, ["Vehicle"]))
+    return rng.choice(VEHICLE_TYPES.get(transport_type, ["Vehicle"]))
 
 def get_capacity(transport_type):
     """Get passenger capacity based on transport type"""
@@ -118,55 +198,52 @@ def get_capacity(transport_type):
     }
     return capacities.get(transport_type, "4 passengers")
 
-def get_transport_features(transport_type):
-    """Get features based on transport type"""
-    all_features = ["AC", "WiFi", "GPS", "Child Seat", "Wheelchair Access", "Luggage Space"]
-    
-    if transport_type == "limo":
-        return random.sample(all_features + ["Champagne", "Professional Driver", "Leather Seats"], 4)
-    elif transport_type == "uber":
-        return random.sample(all_features, 3)
-    elif transport_type == "shuttle":
-        return random.sample(all_features + ["Multiple Stops"], 3)
-    else:  # taxi
-        return random.sample(all_features, 2)
+def get_transport_features(transport_type, rng=random):
+    """Get features based on transport type, as a mask over TRANSPORT_FEATURE_VOCAB"""
+    features, count = TYPE_FEATURES.get(transport_type, TYPE_FEATURES["taxi"])
+    return TRANSPORT_FEATURE_VOCAB.mask(rng.sample(features, count))
 
 @router.get("/uber/login")
-def uber_login():
-    """Redirect user to Uber OAuth login."""
+async def uber_login(user: UserOut = Depends(get_current_user)):
+    """Uber OAuth authorize URL for the logged-in user, for the client to navigate to.
+
+    The user is identified by the Authorization header, so the access token
+    never appears in a URL; the user id is carried through Uber in a signed,
+    short-lived `state`.
+    """
+    state = create_access_token(
+        {"sub": str(user.id), "purpose": "uber_oauth"}, timedelta(minutes=UBER_STATE_EXPIRE_MINUTES)
+    )
     params = {
         "client_id": UBER_CLIENT_ID,
         "response_type": "code",
         "scope": "profile history places request",
         "redirect_uri": UBER_REDIRECT_URI,
-        "state": "uber_demo_state"
+        "state": state
     }
-    url = f"https://login.uber.com/oauth/v2/authorize?{urlencode(params)}"
-    return RedirectResponse(url)
+    return {"authorize_url": f"https://login.uber.com/oauth/v2/authorize?{urlencode(params)}"}
 
 @router.get("/uber/callback")
 async def uber_callback(code: str = None, state: str = None):
-    """Handle Uber OAuth callback, exchange code for access token."""
-    global UBER_ACCESS_TOKEN
+    """Handle Uber OAuth callback, exchange code for the user's tokens."""
     if not code:
         return JSONResponse({"error": "No code provided"}, status_code=400)
-    token_url = "https://login.uber.com/oauth/v2/token"
-    data = {
-        "client_id": UBER_CLIENT_ID,
-        "client_secret": UBER_CLIENT_SECRET,
-        "grant_type": "authorization_code",
-        "redirect_uri": UBER_REDIRECT_URI,
-        "code": code
-    }
-    headers = {"Content-Type": "application/x-www-form-urlencoded"}
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        resp = await client.post(token_url, data=data, headers=headers)
-        if resp.status_code == 200:
-            token_data = resp.json()
-            UBER_ACCESS_TOKEN = token_data.get("access_token")
-            return JSONResponse({"success": True, "access_token": UBER_ACCESS_TOKEN})
-        else:
-            return JSONResponse({"error": resp.text}, status_code=resp.status_code)
+    claims = decode_access_token(state) if state else {}
+    if claims.get("purpose") != "uber_oauth":
+        return JSONResponse({"error": "Invalid state"}, status_code=400)
+    try:
+        record = await exchange_code(int(claims["sub"]), code)
+    except UberTokenError as e:
+        return JSONResponse({"error": e.detail}, status_code=e.status_code)
+    return JSONResponse({"success": True, "expires_at": record["expires_at"].isoformat()})
+
+@router.get("/uber/status")
+async def uber_status(user: UserOut = Depends(get_current_user)):
+    """Whether the logged-in user has connected Uber"""
+    record = await get_uber_token(user.id)
+    if record is None:
+        return {"connected": False}
+    return {"connected": True, "expires_at": record["expires_at"].isoformat()}
 
 @router.get("/health")
 async def health_check():
@@ -181,7 +258,7 @@ async def test_transport_search():
         return {
             "status": "success",
             "message": "Transport search is working!",
-            "test_results": results[:3]  # Return first 3 for brevity
+            "test_results": [serialize_transport(t) for t in results[:3]]  # Return first 3 for brevity
         }
     except Exception as e:
         return {
@@ -0,0 +1,71 @@
+from fastapi import APIRouter, HTTPException, Request
+import asyncio
+import logging
+import os
+import time
+from .flights import find_flights, serialize_flight
+from .hotels import find_hotels, serialize_hotel
+from .transport import find_transports, serialize_transport
+
+router = APIRouter(prefix="/trips", tags=["trips"])
+logger = logging.getLogger(__name__)
+
+# Overall deadline for one trip search; sources still running are reported as timed out
+TRIP_SEARCH_TIMEOUT = float(os.getenv("TRIP_SEARCH_TIMEOUT", "4.0"))
+
+@router.post("/search")
+async def search_trip(request: Request):
+    """Search flights, hotels and transport for a trip in one request.
+
+    Body: from/to (flights), location (hotels, defaults to `to`), checkIn,
+    checkOut, guests, rooms, and pickup/dropoff/type (transport, defaulting
+    to the destination airport and city). The three searches run
+    concurrently under one deadline; each source reports its own status
+    (ok, error, timeout or skipped) so a slow source only drops its own
+    results.
+    """
+    data = await request.json()
+    if not data.get("to") and not data.get("location"):
+        raise HTTPException(status_code=400, detail="A destination (to or location) is required")
+
+    location = data.get("location") or data["to"]
+    guests = int(data.get("guests", 1))
+    rooms = int(data.get("rooms", 1))
+    searches = {
+        "hotels": (
+            lambda: find_hotels(location, guests, rooms, data.get("checkIn", "2024-01-01"), data.get("checkOut", "2024-01-02")),
+            serialize_hotel
+        ),
+        "transport": (
+            lambda: find_transports(
+                data.get("pickup") or f"{location} Airport", data.get("dropoff") or location, data.get("type", "taxi")
+            ),
+            serialize_transport
+        ),
+    }
+    if data.get("from") and data.get("to"):
+        searches["flights"] = (lambda: find_flights(data["from"], data["to"]), serialize_flight)
+
+    started = time.monotonic()
+    tasks = {name: asyncio.ensure_future(search()) for name, (search, _) in searches.items()}
+    done, pending = await asyncio.wait(tasks.values(), timeout=TRIP_SEARCH_TIMEOUT)
+    for task in pending:
+        # The shared search keeps running behind its single-flight call and caches its
+        # result from inside that call, so the next search finds it
+        task.cancel()
+
+    response = {"elapsed_ms": round((time.monotonic() - started) * 1000)}
+    for name in ("flights", "hotels", "transport"):
+        if name not in tasks:
+            response[name] = {"status": "skipped", "results": []}
+            continue
+        task = tasks[name]
+        if task in pending:
+            response[name] = {"status": "timeout", "results": []}
+        elif task.exception() is not None:
+            logger.warning("Trip search %s error: %r", name, task.exception())
+            response[name] = {"status": "error", "error": str(task.exception()), "results": []}
+        else:
+            serialize = searches[name][1]
+            response[name] = {"status": "ok", "results": [serialize(item) for item in task.result()]}
+    return response
@@ -1,18 +1,87 @@
-from fastapi import APIRouter
-from ..models import UserOut
+from fastapi import APIRouter, Depends, Request, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+import datetime
+import hashlib
+import json
+import os
+from ..auth import get_current_user
+from ..database import AsyncSessionLocal, get_async_db
+from ..models import UserOut, UserPreferences
+from ..services.cache import TTLCache
 
 router = APIRouter(prefix="/users", tags=["users"])
 
-dummy_user = UserOut(id=1, email="user@example.com", name="John Doe")
+# Returned for any preference a user has not set
+DEFAULT_PREFERENCES = {"language": "en", "currency": "USD", "notifications": True}
+
+# user_id -> (preferences, etag, updated_at of the row they came from). A hit
+# costs no database read. The worker that handles a PUT replaces its own
+# entry at once; other workers may serve the previous preferences (and ETag)
+# for up to PREFERENCES_CACHE_TTL seconds after an update.
+PREFERENCES_CACHE = TTLCache(
+    max_entries=int(os.getenv("PREFERENCES_CACHE_MAX_ENTRIES", "4096")),
+    ttl=float(os.getenv("PREFERENCES_CACHE_TTL", "30")),
+)
 
 @router.get("/profile", response_model=UserOut)
-def get_profile():
-    return dummy_user
+async def get_profile(user: UserOut = Depends(get_current_user)):
+    return user
+
+def preferences_entry(row):
+    """(effective preferences, ETag, updated_at) for a UserPreferences row or None"""
+    preferences = {**DEFAULT_PREFERENCES, **(json.loads(row.data) if row else {})}
+    raw = json.dumps(preferences, sort_keys=True, separators=(",", ":"))
+    etag = f'"{hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]}"'
+    return preferences, etag, row.updated_at if row else None
+
+def newer(entry, other):
+    """Whether cache `entry` comes from a later write than `other`"""
+    return entry[2] is not None and (other[2] is None or entry[2] > other[2])
+
+async def cached_preferences(user_id):
+    """Read-through: the cached entry, else one primary-key read of the row"""
+    entry = PREFERENCES_CACHE.get(user_id)
+    if entry is not None:
+        return entry
+    async with AsyncSessionLocal() as db:
+        entry = preferences_entry(await db.get(UserPreferences, user_id))
+    # A PUT on this worker may have cached a newer entry while the row was being read
+    current = PREFERENCES_CACHE.get(user_id)
+    if current is not None and newer(current, entry):
+        return current
+    PREFERENCES_CACHE.set(user_id, entry)
+    return entry
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison, as If-None-Match requires
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
 
 @router.get("/preferences")
-def get_preferences():
-    return {"language": "en", "currency": "USD", "notifications": True}
+async def get_preferences(request: Request, user: UserOut = Depends(get_current_user)):
+    """The user's preferences with an ETag; 304 with no body if If-None-Match still matches"""
+    preferences, etag, _ = await cached_preferences(user.id)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(preferences, headers=headers)
 
 @router.put("/preferences")
-def update_preferences(prefs: dict):
-    return {"success": True, "updated": prefs} 
\ No newline at end of file
+async def update_preferences(
+    prefs: dict, response: Response,
+    user: UserOut = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)
+):
+    """Replace the user's preferences; unset keys fall back to the defaults"""
+    row = await db.get(UserPreferences, user.id) or UserPreferences(user_id=user.id)
+    row.data = json.dumps(prefs)
+    # Set here rather than by onupdate so the cached entry carries the stored value
+    row.updated_at = datetime.datetime.utcnow()
+    db.add(row)
+    await db.commit()
+    entry = preferences_entry(row)
+    PREFERENCES_CACHE.set(user.id, entry)
+    response.headers["ETag"] = entry[1]
+    return {"success": True, "updated": entry[0]}
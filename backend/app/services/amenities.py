@@ -0,0 +1,58 @@
+from functools import lru_cache
+
+
+class Vocabulary:
+    """Fixed list of amenity/feature names interned as bits of an integer mask.
+
+    Items store one int instead of a list of strings, so "has Pool and Spa"
+    is a single `mask & required == required` per item (or one vectorized
+    AND over a NumPy column). Names are only materialized for responses.
+    """
+
+    def __init__(self, names):
+        self.names = tuple(names)
+        self.bits = {name: 1 << i for i, name in enumerate(self.names)}
+        # Set for names outside the vocabulary; no item ever has it, so a
+        # filter on an unknown amenity matches nothing
+        self.unknown_bit = 1 << len(self.names)
+        self.names_of = lru_cache(maxsize=4096)(self._names_of)
+
+    def __len__(self):
+        return len(self.names)
+
+    def mask(self, names):
+        """Mask for a list of names or a comma-separated string of them"""
+        result = 0
+        for name in name_list(names):
+            result |= self.bits.get(name, self.unknown_bit)
+        return result
+
+    def _names_of(self, mask):
+        """Names set in `mask`, in vocabulary order"""
+        return tuple(name for name, bit in self.bits.items() if mask & bit)
+
+
+def name_list(names):
+    """A list of names from a list or a comma-separated string ("AC, WiFi")"""
+    if isinstance(names, str):
+        return [name.strip() for name in names.split(",") if name.strip()]
+    return list(names or ())
+
+
+def has_all(mask, required):
+    return mask & required == required
+
+
+HOTEL_AMENITIES = [
+    "Free WiFi", "Pool", "Gym", "Restaurant", "Spa",
+    "Business Center", "Free Breakfast", "Parking", "Room Service"
+]
+
+TRANSPORT_FEATURES = [
+    "AC", "WiFi", "GPS", "Child Seat", "Wheelchair Access", "Luggage Space",
+    "Champagne", "Professional Driver", "Leather Seats", "Multiple Stops"
+]
+
+# Shared by the mock generators and the bulk catalog so masks mean the same everywhere
+HOTEL_AMENITY_VOCAB = Vocabulary(HOTEL_AMENITIES)
+TRANSPORT_FEATURE_VOCAB = Vocabulary(TRANSPORT_FEATURES)
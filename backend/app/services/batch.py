@@ -0,0 +1,55 @@
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Parallel searches per batch request and the most queries one request may carry
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "100"))
+
+
+def batch_queries(data):
+    """The "queries" list of a batch body; raises ValueError if missing or too long"""
+    queries = data.get("queries")
+    if not isinstance(queries, list) or not queries:
+        raise ValueError("queries must be a non-empty list")
+    if len(queries) > BATCH_MAX_QUERIES:
+        raise ValueError(f"At most {BATCH_MAX_QUERIES} queries per batch")
+    for i, query in enumerate(queries):
+        if not isinstance(query, dict):
+            raise ValueError(f"Query {i} must be an object")
+    return queries
+
+
+async def run_batch(keyed_calls, concurrency=BATCH_CONCURRENCY):
+    """Run one call per distinct key with at most `concurrency` in flight.
+
+    `keyed_calls` is a list of (key, fn) pairs where `fn()` returns an
+    awaitable; repeated keys run once. Returns {key: (result, error)} with
+    exactly one of the two set, so one failing query does not fail the batch.
+    """
+    calls = dict(keyed_calls)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(fn):
+        async with semaphore:
+            try:
+                return await fn(), None
+            except Exception as e:
+                return None, e
+
+    outcomes = await asyncio.gather(*(run(fn) for fn in calls.values()))
+    return dict(zip(calls, outcomes))
+
+
+def batch_response(keys, outcomes, serialize):
+    """{"queries": key per input query, "results": {key: status and results}}"""
+    results = {}
+    for key, (items, error) in outcomes.items():
+        if error is not None:
+            logger.warning("Batch query %s error: %r", key, error)
+            results[key] = {"status": "error", "error": str(error), "results": []}
+        else:
+            results[key] = {"status": "ok", "results": [serialize(item) for item in items]}
+    return {"queries": keys, "results": results}
@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """Bounded in-process cache with TTL, LRU eviction and stale-while-revalidate.
+
+    Entries are fresh for `ttl` seconds. For a further `stale_ttl` seconds an
+    expired entry is still served while a single background task reloads it.
+    Once `max_entries` is reached the least recently used entry is evicted.
+    """
+
+    def __init__(self, max_entries=1024, ttl=300.0, stale_ttl=0.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._data = OrderedDict()  # key -> (value, stored_at)
+        self._refreshing = {}  # key -> background refresh task
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refresh_errors = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """Return a fresh value for `key`, or `default` if missing or expired"""
+        entry = self._data.get(key)
+        if entry is None or time.monotonic() - entry[1] >= self.ttl:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key, value):
+        self._data[key] = (value, time.monotonic())
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    async def get_or_load(self, key, loader):
+        """Return the cached value for `key`, calling `await loader()` on a miss.
+
+        A stale entry is returned immediately and refreshed in the background.
+        """
+        entry = self._data.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.monotonic() - stored_at
+            if age < self.ttl:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self._data.move_to_end(key)
+                self.stale_hits += 1
+                self._refresh(key, loader)
+                return value
+            del self._data[key]
+        self.misses += 1
+        value = await loader()
+        self.set(key, value)
+        return value
+
+    def _refresh(self, key, loader):
+        if key in self._refreshing:
+            return
+
+        async def refresh():
+            try:
+                self.set(key, await loader())
+            except Exception as e:
+                # Keep serving the stale value until the next attempt
+                self.refresh_errors += 1
+                logger.warning("Cache refresh error for %r: %s", key, e)
+            finally:
+                self._refreshing.pop(key, None)
+
+        self._refreshing[key] = asyncio.ensure_future(refresh())
+
+    def stats(self):
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "refresh_errors": self.refresh_errors,
+        }
@@ -0,0 +1,350 @@
+"""Bulk hotel/ride inventory for capacity testing.
+
+The generator draws every attribute of a large catalog as NumPy arrays in one
+vectorized pass and writes them to a single columnar .npz file together with
+the name vocabularies, so the file is self-describing. The search endpoints
+load it when INVENTORY_CATALOG_PATH is set and answer queries from
+precomputed per-city / per-type price orderings.
+
+    python -m app.services.catalog --hotels 500000 --rides 500000 --out catalog.npz
+"""
+import argparse
+import os
+import numpy as np
+from .money import Money
+from .hotel_index import HotelFilters
+from .amenities import HOTEL_AMENITY_VOCAB, TRANSPORT_FEATURE_VOCAB
+
+INVENTORY_CATALOG_PATH = os.getenv("INVENTORY_CATALOG_PATH")
+USD_TO_INR = 80
+HOTEL_SORT_COLUMNS = {"price": "hotel_price_minor", "rating": "hotel_rating", "stars": "hotel_stars"}
+
+
+def _flatten(groups):
+    """Flatten a list of name lists into (names, offsets) arrays"""
+    names = [name for group in groups for name in group]
+    offsets = np.cumsum([0] + [len(group) for group in groups])
+    return np.array(names, dtype=str), offsets.astype(np.int32)
+
+
+def _choose_subsets(rng, n, pool_size, sizes, allowed=None):
+    """Boolean (n, pool_size) matrix with `sizes[i]` random True columns per row.
+
+    `allowed` optionally masks which columns each row may pick from.
+    """
+    keys = rng.random((n, pool_size))
+    if allowed is not None:
+        keys[~allowed] = np.inf
+    ranks = np.argsort(np.argsort(keys, axis=1), axis=1)
+    return ranks < sizes[:, None]
+
+
+def _pack_mask(matrix):
+    """Pack a boolean (n, k) matrix into one uint32 bitmask per row"""
+    return (matrix * (1 << np.arange(matrix.shape[1], dtype=np.uint32))).sum(axis=1, dtype=np.uint32)
+
+
+def _remap_mask(masks, names, vocabulary):
+    """Re-express masks over the file's `names` as masks over `vocabulary`.
+
+    Names the vocabulary does not know are dropped.
+    """
+    if tuple(str(name) for name in names) == vocabulary.names:
+        return masks
+    remapped = np.zeros(len(masks), dtype=np.uint32)
+    for i, name in enumerate(names):
+        bit = vocabulary.bits.get(str(name))
+        if bit is not None:
+            remapped |= np.where(masks & np.uint32(1 << i), np.uint32(bit), np.uint32(0))
+    return remapped
+
+
+def _rank_within(groups, group_count):
+    """Position of each row among the rows sharing its group value"""
+    order = np.argsort(groups, kind="stable")
+    starts = np.searchsorted(groups[order], np.arange(group_count))
+    ranks = np.empty(len(groups), dtype=np.int64)
+    ranks[order] = np.arange(len(groups)) - starts[groups[order]]
+    return ranks
+
+
+def generate_hotels(n, city_hotels, chains, hotel_types, amenities, streets, seed=0):
+    """Generate `n` hotels spread over the cities of `city_hotels`.
+
+    The first hotels in each city take that city's real names; the rest are
+    "<chain> <type>" names, priced with the same chain rules as the mock data.
+    """
+    rng = np.random.default_rng(seed)
+    cities = list(city_hotels)
+    city_names, city_offsets = _flatten([city_hotels[c] for c in cities])
+    named_counts = np.diff(city_offsets)
+
+    city = rng.integers(0, len(cities), n, dtype=np.int16)
+    rank = _rank_within(city, len(cities))
+    named = np.where(rank < named_counts[city], rank, -1).astype(np.int16)
+    chain = rng.integers(0, len(chains), n, dtype=np.int8)
+    hotel_type = rng.integers(0, len(hotel_types), n, dtype=np.int8)
+
+    premium = np.array([("Marriott" in c or "Hilton" in c) for c in chains])
+    budget = np.array([("Best Western" in c or "Comfort" in c) for c in chains])
+    base_price = np.where(
+        named >= 0, rng.integers(120, 401, n),
+        np.where(premium[chain], rng.integers(150, 401, n),
+                 np.where(budget[chain], rng.integers(60, 151, n), rng.integers(80, 301, n))))
+
+    amenity_sizes = rng.integers(3, 7, n)
+    return {
+        "hotel_cities": np.array(cities, dtype=str),
+        "hotel_city_names": city_names,
+        "hotel_city_name_offsets": city_offsets,
+        "hotel_chains": np.array(chains, dtype=str),
+        "hotel_types": np.array(hotel_types, dtype=str),
+        "hotel_amenity_names": np.array(amenities, dtype=str),
+        "hotel_streets": np.array(streets, dtype=str),
+        "hotel_city": city,
+        "hotel_named": named,
+        "hotel_chain": chain,
+        "hotel_type": hotel_type,
+        "hotel_price_minor": (base_price * USD_TO_INR * 100).astype(np.int64),
+        "hotel_rating": np.round(rng.uniform(3.5, 5.0, n), 1).astype(np.float32),
+        "hotel_stars": rng.integers(3, 6, n, dtype=np.int8),
+        "hotel_street_no": rng.integers(100, 1000, n, dtype=np.int16),
+        "hotel_street": rng.integers(0, len(streets), n, dtype=np.int8),
+        "hotel_amenity_mask": _pack_mask(_choose_subsets(rng, n, len(amenities), amenity_sizes)),
+    }
+
+
+def generate_rides(n, types, providers, base_prices, vehicle_types, type_features, seed=0):
+    """Generate `n` ride options across `types` with the mock data's fare rules"""
+    rng = np.random.default_rng(seed + 1)
+    provider_names, provider_offsets = _flatten([providers[t] for t in types])
+    vehicle_names, vehicle_offsets = _flatten([vehicle_types[t] for t in types])
+    feature_names = []
+    for t in types:
+        for feature in type_features[t][0]:
+            if feature not in feature_names:
+                feature_names.append(feature)
+    allowed_by_type = np.array([[f in type_features[t][0] for f in feature_names] for t in types])
+    feature_counts = np.array([type_features[t][1] for t in types])
+
+    ride_type = rng.integers(0, len(types), n, dtype=np.int8)
+    provider = (rng.random(n) * np.diff(provider_offsets)[ride_type]).astype(np.int16)
+    vehicle = (rng.random(n) * np.diff(vehicle_offsets)[ride_type]).astype(np.int16)
+    low = np.array([base_prices[t][0] for t in types])[ride_type]
+    high = np.array([base_prices[t][1] for t in types])[ride_type]
+    base_price = low + (rng.random(n) * (high - low + 1)).astype(np.int64)
+    final_price = np.maximum(10, base_price + rng.integers(-5, 11, n))
+    return {
+        "ride_types": np.array(types, dtype=str),
+        "ride_provider_names": provider_names,
+        "ride_provider_offsets": provider_offsets,
+        "ride_vehicle_names": vehicle_names,
+        "ride_vehicle_offsets": vehicle_offsets,
+        "ride_feature_names": np.array(feature_names, dtype=str),
+        "ride_type": ride_type,
+        "ride_provider": provider,
+        "ride_vehicle": vehicle,
+        "ride_price_minor": (final_price * USD_TO_INR * 100).astype(np.int64),
+        "ride_duration": rng.integers(15, 61, n, dtype=np.int16),
+        "ride_feature_mask": _pack_mask(_choose_subsets(
+            rng, n, len(feature_names), feature_counts[ride_type], allowed_by_type[ride_type])),
+    }
+
+
+def save_catalog(path, **columns):
+    np.savez(path, **columns)
+
+
+class HotelCatalog:
+    """Hotels from a catalog file with a price-sorted row index per city"""
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.cities = [str(c) for c in columns["hotel_cities"]]
+        self.city_ids = {city: i for i, city in enumerate(self.cities)}
+        self.city_names = columns["hotel_city_names"]
+        self.city_name_offsets = columns["hotel_city_name_offsets"]
+        by_price = np.argsort(columns["hotel_price_minor"], kind="stable")
+        city_sorted = columns["hotel_city"][by_price]
+        self.rows_by_city = {i: by_price[city_sorted == i] for i in range(len(self.cities))}
+        # Masks are re-expressed over the shared vocabulary so records serialize like mock ones
+        self.vocabulary = HOTEL_AMENITY_VOCAB
+        self.amenity_masks = _remap_mask(
+            columns["hotel_amenity_mask"], columns["hotel_amenity_names"], self.vocabulary)
+        self._orderings = {}
+
+    def __len__(self):
+        return len(self.columns["hotel_city"])
+
+    def has_city(self, location):
+        return location.strip().lower() in self.city_ids
+
+    def name(self, row):
+        c = self.columns
+        named = c["hotel_named"][row]
+        if named >= 0:
+            return str(self.city_names[self.city_name_offsets[c["hotel_city"][row]] + named])
+        return f"{c['hotel_chains'][c['hotel_chain'][row]]} {c['hotel_types'][c['hotel_type'][row]]}"
+
+    def record(self, row, location, guests, rooms):
+        """Build a result dict shaped like the mock generator's output"""
+        c = self.columns
+        name = self.name(row)
+        price = Money(int(c["hotel_price_minor"][row]))
+        return {
+            "id": f"{self.cities[c['hotel_city'][row]]}_catalog_{row}",
+            "name": name,
+            "location": location,
+            "address": f"{c['hotel_street_no'][row]} {c['hotel_streets'][c['hotel_street'][row]]}, {location}",
+            "price_per_night": price,
+            "total_price": price * (guests * rooms),
+            "rating": round(float(c["hotel_rating"][row]), 1),
+            "amenity_mask": int(self.amenity_masks[row]),
+            "stars": int(c["hotel_stars"][row]),
+            "image": f"https://via.placeholder.com/300x200/2563eb/ffffff?text={name.replace(' ', '+')}"
+        }
+
+    def ordering(self, city_id, sort="price", order="asc"):
+        """Rows of a city in (sort, order) order, computed once and cached"""
+        key = (city_id, sort, order)
+        rows = self._orderings.get(key)
+        if rows is None:
+            by_price = self.rows_by_city[city_id]
+            if sort == "price":
+                rows = by_price if order == "asc" else by_price[::-1]
+            else:
+                values = self.columns[HOTEL_SORT_COLUMNS[sort]][by_price]
+                rows = by_price[np.argsort(-values if order == "desc" else values, kind="stable")]
+            self._orderings[key] = rows
+        return rows
+
+    def page(self, location, guests, rooms, filters, sort="price", order="asc", position=0, limit=50):
+        """Return (hotels, next_position) for one page of a city's filtered hotels"""
+        city_id = self.city_ids.get(location.strip().lower())
+        if city_id is None:
+            return [], None
+        rows = self.ordering(city_id, sort, order)[position:]
+        c = self.columns
+        mask = np.ones(len(rows), dtype=bool)
+        if filters.min_price is not None:
+            mask &= c["hotel_price_minor"][rows] >= filters.min_price
+        if filters.max_price is not None:
+            mask &= c["hotel_price_minor"][rows] <= filters.max_price
+        if filters.min_rating is not None:
+            mask &= c["hotel_rating"][rows] >= filters.min_rating
+        if filters.stars is not None:
+            mask &= np.isin(c["hotel_stars"][rows], list(filters.stars))
+        if filters.amenities:
+            required = self.vocabulary.mask(filters.amenities)
+            if required >= 1 << 32:
+                return [], None
+            required = np.uint32(required)
+            mask &= (self.amenity_masks[rows] & required) == required
+        matched = np.flatnonzero(mask)[:limit + 1]
+        next_position = position + int(matched[limit]) if len(matched) > limit else None
+        return [self.record(row, location, guests, rooms) for row in rows[matched[:limit]]], next_position
+
+    def search(self, location, guests=1, rooms=1, limit=50):
+        """Cheapest `limit` hotels in a city"""
+        return self.page(location, guests, rooms, HotelFilters(), limit=limit)[0]
+
+
+class RideCatalog:
+    """Rides from a catalog file with a price-sorted row index per type"""
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.types = [str(t) for t in columns["ride_types"]]
+        self.type_ids = {t: i for i, t in enumerate(self.types)}
+        self.by_price = np.argsort(columns["ride_price_minor"], kind="stable")
+        type_sorted = columns["ride_type"][self.by_price]
+        self.rows_by_type = {i: self.by_price[type_sorted == i] for i in range(len(self.types))}
+        self.vocabulary = TRANSPORT_FEATURE_VOCAB
+        self.feature_masks = _remap_mask(
+            columns["ride_feature_mask"], columns["ride_feature_names"], self.vocabulary)
+
+    def __len__(self):
+        return len(self.columns["ride_type"])
+
+    def record(self, row, pickup, dropoff, capacity):
+        c = self.columns
+        ride_type = self.types[c["ride_type"][row]]
+        provider = str(c["ride_provider_names"][c["ride_provider_offsets"][c["ride_type"][row]] + c["ride_provider"][row]])
+        vehicle = str(c["ride_vehicle_names"][c["ride_vehicle_offsets"][c["ride_type"][row]] + c["ride_vehicle"][row]])
+        duration = int(c["ride_duration"][row])
+        return {
+            "id": f"{ride_type}_catalog_{row}",
+            "type": ride_type,
+            "provider": provider,
+            "pickup": pickup,
+            "dropoff": dropoff,
+            "price": Money(int(c["ride_price_minor"][row])),
+            "duration": f"{duration} min",
+            "estimated_arrival": f"{duration} min",
+            "vehicle_type": vehicle,
+            "capacity": capacity(ride_type),
+            "feature_mask": int(self.feature_masks[row]),
+            "image": f"https://via.placeholder.com/300x200/10b981/ffffff?text={provider.replace(' ', '+')}"
+        }
+
+    def search(self, pickup, dropoff, transport_type, capacity, limit=50, features=0):
+        """Cheapest `limit` rides of a type ("all" for any type) having all `features` (a mask)"""
+        if transport_type == "all":
+            rows = self.by_price
+        else:
+            rows = self.rows_by_type.get(self.type_ids.get(transport_type), np.empty(0, dtype=np.int64))
+        if features:
+            if features >= 1 << 32:
+                return []
+            required = np.uint32(features)
+            rows = rows[(self.feature_masks[rows] & required) == required]
+        return [self.record(row, pickup, dropoff, capacity) for row in rows[:limit]]
+
+
+class Catalog:
+    def __init__(self, columns):
+        self.hotels = HotelCatalog(columns) if "hotel_city" in columns else None
+        self.rides = RideCatalog(columns) if "ride_type" in columns else None
+
+
+def load_catalog(path):
+    with np.load(path) as data:
+        return Catalog({name: data[name] for name in data.files})
+
+
+_catalog = None
+
+
+def get_catalog():
+    """The catalog at INVENTORY_CATALOG_PATH, loaded once; None if not configured"""
+    global _catalog
+    if _catalog is None and INVENTORY_CATALOG_PATH and os.path.exists(INVENTORY_CATALOG_PATH):
+        _catalog = load_catalog(INVENTORY_CATALOG_PATH)
+    return _catalog
+
+
+def main():
+    from ..routes import hotels, transport
+
+    parser = argparse.ArgumentParser(description="Generate a bulk hotel/ride catalog")
+    parser.add_argument("--hotels", type=int, default=100000)
+    parser.add_argument("--rides", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=INVENTORY_CATALOG_PATH or "catalog.npz")
+    args = parser.parse_args()
+
+    columns = {}
+    if args.hotels:
+        columns.update(generate_hotels(
+            args.hotels, hotels.CITY_HOTELS, hotels.HOTEL_CHAINS, hotels.HOTEL_TYPES,
+            hotels.HOTEL_AMENITIES, hotels.GENERIC_HOTEL_STREETS, seed=args.seed))
+    if args.rides:
+        columns.update(generate_rides(
+            args.rides, transport.TRANSPORT_TYPES, transport.RIDE_PROVIDERS, transport.RIDE_BASE_PRICES,
+            transport.VEHICLE_TYPES, transport.TYPE_FEATURES, seed=args.seed))
+    save_catalog(args.out, **columns)
+    print(f"Wrote {args.hotels} hotels and {args.rides} rides to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""Offline, distance-based ride fares.
+
+Pickup and dropoff are resolved to coordinates from the location gazetteer:
+a known city or alias maps to its centre, "lat,lon" input is snapped to the
+nearest city through a grid index, and landmarks ("Airport", "Station") or
+unknown neighbourhoods are placed at a stable, seeded offset from the city
+the ride is in. Fares and durations then follow per-vehicle-class rates over
+the estimated road distance. Quotes are memoized per (pickup, dropoff, class).
+"""
+import math
+import os
+import re
+from functools import lru_cache
+from typing import NamedTuple
+from .locations import LOCATIONS, normalize_term
+from .money import Money
+from .seeding import seeded_random
+
+EARTH_RADIUS_KM = 6371.0
+# Road distance is longer than the great-circle distance
+ROAD_FACTOR = 1.3
+# City speeds apply to the first CITY_KM of a ride, HIGHWAY_SPEED_KMH beyond that
+CITY_KM = 20
+HIGHWAY_SPEED_KMH = 60
+# Coordinates further than this from every known city are not snapped to one
+SNAP_RADIUS_KM = 50
+FARE_CACHE_SIZE = int(os.getenv("FARE_CACHE_SIZE", "65536"))
+
+# Per-class tariff in rupees: flag fall, per km, per minute, minimum fare,
+# plus the average in-city speed (km/h)
+VEHICLE_RATES = {
+    "taxi": {"base": 60, "per_km": 16, "per_min": 1.5, "minimum": 150, "speed": 26},
+    "uber": {"base": 50, "per_km": 14, "per_min": 1.2, "minimum": 120, "speed": 28},
+    "limo": {"base": 500, "per_km": 45, "per_min": 4.0, "minimum": 1500, "speed": 30},
+    "shuttle": {"base": 40, "per_km": 9, "per_min": 0.5, "minimum": 100, "speed": 22},
+}
+
+# Typical distance (km) of a landmark from its city centre
+LANDMARK_DISTANCES = {
+    "airport": 14, "station": 4, "railway": 4, "bus stand": 3, "port": 6,
+    "hotel": 3, "mall": 5, "university": 8, "downtown": 0, "city centre": 0, "city center": 0,
+}
+# Distance range (km) from the centre for places the gazetteer does not know
+UNKNOWN_PLACE_KM = (2, 10)
+
+COORDINATES = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$")
+
+
+class FareQuote(NamedTuple):
+    distance_km: float
+    minutes: int
+    fare: Money
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points in km"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def offset_point(lat, lon, km, bearing):
+    """Point `km` away from (lat, lon) along `bearing` (radians); fine for city-scale offsets"""
+    dlat = km * math.cos(bearing) / 111.0
+    dlon = km * math.sin(bearing) / (111.0 * max(math.cos(math.radians(lat)), 0.01))
+    return lat + dlat, lon + dlon
+
+
+class GridIndex:
+    """Points bucketed into cell_deg x cell_deg cells for nearest-point lookups.
+
+    A lookup only measures points in the cells around the query, widening
+    ring by ring until the search radius is covered.
+    """
+
+    def __init__(self, points, cell_deg=1.0):
+        self.points = points
+        self.cell_deg = cell_deg
+        self.cells = {}
+        for i, (lat, lon) in enumerate(points):
+            self.cells.setdefault(self._cell(lat, lon), []).append(i)
+
+    def _cell(self, lat, lon):
+        return int(math.floor(lat / self.cell_deg)), int(math.floor(lon / self.cell_deg))
+
+    def nearest(self, lat, lon, max_km):
+        """Index of the nearest point within `max_km`, or None"""
+        row, col = self._cell(lat, lon)
+        # Cells narrow towards the poles, so size the search by their east-west width
+        cell_km = 111.0 * self.cell_deg * max(math.cos(math.radians(lat)), 0.01)
+        rings = int(math.ceil(max_km / cell_km)) + 1
+        best, best_km = None, max_km
+        for ring in range(rings + 1):
+            for r in range(row - ring, row + ring + 1):
+                for c in range(col - ring, col + ring + 1):
+                    if max(abs(r - row), abs(c - col)) != ring:
+                        continue
+                    for i in self.cells.get((r, c), ()):
+                        km = haversine_km(lat, lon, *self.points[i])
+                        if km <= best_km:
+                            best, best_km = i, km
+            if best is not None:
+                # Anything in a further ring is at least a ring width away
+                if best_km <= ring * cell_km:
+                    break
+        return best
+
+
+class FareEngine:
+    def __init__(self, locations, rates=VEHICLE_RATES):
+        self.locations = locations
+        self.rates = rates
+        self.grid = GridIndex([(loc["lat"], loc["lon"]) for loc in locations.locations])
+        # Distance is shared by every vehicle class, so it is memoized on its own
+        self.distance_km = lru_cache(maxsize=FARE_CACHE_SIZE)(self._distance_km)
+        self._estimate = lru_cache(maxsize=FARE_CACHE_SIZE)(self._estimate_uncached)
+
+    def city_of(self, text):
+        """The gazetteer city a place lies in or names, or None"""
+        match = COORDINATES.match(text)
+        if match:
+            i = self.grid.nearest(float(match.group(1)), float(match.group(2)), SNAP_RADIUS_KM)
+            return self.locations.locations[i] if i is not None else None
+        location = self.locations.resolve(text)
+        if location:
+            return location
+        # "Koregaon Park, Pune" / "Pune Airport": look for a city name inside the text
+        words = re.split(r"[\s,]+", text)
+        for size in range(min(len(words), 3), 0, -1):
+            for start in range(len(words) - size + 1):
+                term = normalize_term(" ".join(words[start:start + size]))
+                if term in self.locations.exact:
+                    return self.locations.locations[self.locations.exact[term]]
+        return None
+
+    def point(self, text, city):
+        """Coordinates for a place, using `city` to place landmarks and unknown places"""
+        match = COORDINATES.match(text)
+        if match:
+            return float(match.group(1)), float(match.group(2))
+        term = normalize_term(text)
+        centre = (city["lat"], city["lon"]) if city else (0.0, 0.0)
+        if city and self.locations.resolve(term) is city:
+            return centre
+        rng = seeded_random("place", term, city["name"] if city else "")
+        km = next((d for landmark, d in LANDMARK_DISTANCES.items() if landmark in term), None)
+        if km is None:
+            km = rng.uniform(*UNKNOWN_PLACE_KM)
+        return offset_point(centre[0], centre[1], km, rng.uniform(0, 2 * math.pi))
+
+    def _distance_km(self, pickup, dropoff):
+        """Estimated road distance between two places"""
+        pickup_city = self.city_of(pickup)
+        dropoff_city = self.city_of(dropoff)
+        # A landmark with no city of its own is taken to be in the other end's city
+        start = self.point(pickup, pickup_city or dropoff_city)
+        end = self.point(dropoff, dropoff_city or pickup_city)
+        return max(1.0, haversine_km(*start, *end) * ROAD_FACTOR)
+
+    def _estimate_uncached(self, pickup, dropoff, vehicle_class):
+        rates = self.rates.get(vehicle_class, self.rates["taxi"])
+        km = self.distance_km(pickup, dropoff)
+        city_km = min(km, CITY_KM)
+        minutes = city_km / rates["speed"] * 60 + (km - city_km) / HIGHWAY_SPEED_KMH * 60
+        fare = rates["base"] + rates["per_km"] * km + rates["per_min"] * minutes
+        return FareQuote(round(km, 1), max(1, round(minutes)), Money.of(round(max(fare, rates["minimum"]))))
+
+    def quote(self, pickup, dropoff, vehicle_class="taxi"):
+        """Distance, duration and fare for one ride; memoized per normalized route and class"""
+        return self._estimate(normalize_term(pickup), normalize_term(dropoff), vehicle_class)
+
+    def cache_info(self):
+        return self._estimate.cache_info()
+
+
+FARES = FareEngine(LOCATIONS)
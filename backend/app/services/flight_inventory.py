@@ -0,0 +1,47 @@
+import json
+import os
+from .money import Money
+
+DEFAULT_INVENTORY_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "flights.json")
+FLIGHT_INVENTORY_PATH = os.getenv("FLIGHT_INVENTORY_PATH", DEFAULT_INVENTORY_PATH)
+
+
+class FlightInventory:
+    """Local flight inventory indexed by (origin, destination) and by origin.
+
+    Both indexes are built once at load time, so a lookup is a dict access no
+    matter how many routes the data file holds.
+    """
+
+    def __init__(self, flights):
+        by_route = {}
+        by_origin = {}
+        for flight in flights:
+            origin = flight["from_city"].upper()
+            destination = flight["to_city"].upper()
+            by_route.setdefault((origin, destination), []).append(flight)
+            by_origin.setdefault(origin, []).append(flight)
+        self.by_route = {key: tuple(value) for key, value in by_route.items()}
+        self.by_origin = {key: tuple(value) for key, value in by_origin.items()}
+        self.size = len(flights)
+
+    @classmethod
+    def load(cls, path=FLIGHT_INVENTORY_PATH):
+        with open(path, encoding="utf-8") as f:
+            records = json.load(f)
+        flights = []
+        for record in records:
+            flight = dict(record)
+            flight["price"] = Money(flight.pop("price_minor"), flight.pop("currency", "INR"))
+            flights.append(flight)
+        return cls(flights)
+
+    def lookup(self, origin, destination=None):
+        """Flights from `origin`, optionally only those flying to `destination`"""
+        origin = origin.strip().upper()
+        if destination is None:
+            return list(self.by_origin.get(origin, ()))
+        return list(self.by_route.get((origin, destination.strip().upper()), ()))
+
+
+FLIGHT_INVENTORY = FlightInventory.load()
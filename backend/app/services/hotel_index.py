@@ -0,0 +1,81 @@
+from bisect import bisect_left, bisect_right
+from .amenities import has_all
+
+# Sort keys supported by hotel search and their default direction
+SORT_KEYS = {
+    "price": lambda hotel: hotel["price_per_night"].minor,
+    "rating": lambda hotel: hotel["rating"],
+    "stars": lambda hotel: hotel["stars"],
+}
+DEFAULT_ORDER = {"price": "asc", "rating": "desc", "stars": "desc"}
+
+
+class HotelFilters:
+    """Hotel search filters; prices are in minor units, None means unbounded"""
+
+    def __init__(self, min_price=None, max_price=None, min_rating=None, stars=None, amenities=None):
+        self.min_price = min_price
+        self.max_price = max_price
+        self.min_rating = min_rating
+        self.stars = set(stars) if stars else None
+        self.amenities = list(amenities) if amenities else []
+
+    def matches(self, hotel, amenity_mask=0):
+        price = hotel["price_per_night"].minor
+        if self.min_price is not None and price < self.min_price:
+            return False
+        if self.max_price is not None and price > self.max_price:
+            return False
+        if self.min_rating is not None and hotel["rating"] < self.min_rating:
+            return False
+        if self.stars is not None and hotel["stars"] not in self.stars:
+            return False
+        return has_all(hotel["amenity_mask"], amenity_mask)
+
+
+class HotelIndex:
+    """Pre-sorted orderings of one hotel result set.
+
+    Every sort key/direction is sorted once when the index is built, so a
+    page is a scan from the cursor position rather than a sort per request.
+    Price-ordered scans also bisect straight to the requested price range.
+    """
+
+    def __init__(self, hotels, vocabulary):
+        self.hotels = hotels
+        self.vocabulary = vocabulary
+        self.orders = {}
+        for key, value in SORT_KEYS.items():
+            positions = range(len(hotels))
+            self.orders[(key, "asc")] = sorted(positions, key=lambda i: (value(hotels[i]), i))
+            self.orders[(key, "desc")] = sorted(positions, key=lambda i: (-value(hotels[i]), i))
+        self.price_keys = {
+            "asc": [hotels[i]["price_per_night"].minor for i in self.orders[("price", "asc")]],
+            "desc": [-hotels[i]["price_per_night"].minor for i in self.orders[("price", "desc")]],
+        }
+
+    def _bounds(self, filters, sort, order):
+        if sort != "price":
+            return 0, len(self.hotels)
+        keys = self.price_keys[order]
+        low, high = filters.min_price, filters.max_price
+        if order == "desc":
+            low, high = (-high if high is not None else None), (-low if low is not None else None)
+        start = bisect_left(keys, low) if low is not None else 0
+        stop = bisect_right(keys, high) if high is not None else len(keys)
+        return start, stop
+
+    def page(self, filters, sort="price", order="asc", position=0, limit=None):
+        """Return (hotels, next_position); next_position is None on the last page"""
+        ordering = self.orders[(sort, order)]
+        start, stop = self._bounds(filters, sort, order)
+        amenity_mask = self.vocabulary.mask(filters.amenities)
+        results = []
+        for i in range(max(start, position), stop):
+            hotel = self.hotels[ordering[i]]
+            if not filters.matches(hotel, amenity_mask):
+                continue
+            if limit is not None and len(results) == limit:
+                return results, i
+            results.append(hotel)
+        return results, None
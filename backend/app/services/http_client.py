@@ -0,0 +1,80 @@
+import importlib.util
+import os
+import httpx
+
+# Shared upstream HTTP clients.
+# One pooled client lives for the whole app lifetime so upstream calls reuse
+# keep-alive connections instead of paying a new TCP+TLS handshake per request.
+# Hosts listed in HTTP_HOST_LIMITS get their own pool sized for that host.
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10.0"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30.0"))
+# HTTP/2 needs the optional `h2` package (pip install httpx[http2])
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true" and importlib.util.find_spec("h2") is not None
+
+
+def parse_host_limits(value):
+    """Parse "host=max_connections,host=max_connections" into a dict"""
+    limits = {}
+    for item in value.split(","):
+        if "=" not in item:
+            continue
+        host, size = item.split("=", 1)
+        limits[host.strip().lower()] = int(size)
+    return limits
+
+
+# Per-host pool sizing, e.g. HTTP_HOST_LIMITS="api.aviationstack.com=20,login.uber.com=5"
+HTTP_HOST_LIMITS = parse_host_limits(os.getenv(
+    "HTTP_HOST_LIMITS", "api.aviationstack.com=20,login.uber.com=5"
+))
+
+_default_client = None
+_host_clients = {}
+
+
+def _build_client(max_connections, max_keepalive):
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(timeout=HTTP_TIMEOUT, limits=limits, http2=HTTP2_ENABLED)
+
+
+def get_http_client(host=None):
+    """Return the pooled client for `host`, or the shared default client.
+
+    Clients are normally created by start_http_clients() on app startup; they
+    are created lazily here too so the helpers also work outside the app.
+    """
+    global _default_client
+    host = (host or "").lower()
+    if host in HTTP_HOST_LIMITS:
+        client = _host_clients.get(host)
+        if client is None or client.is_closed:
+            size = HTTP_HOST_LIMITS[host]
+            client = _host_clients[host] = _build_client(size, min(size, HTTP_MAX_KEEPALIVE))
+        return client
+    if _default_client is None or _default_client.is_closed:
+        _default_client = _build_client(HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE)
+    return _default_client
+
+
+async def start_http_clients():
+    get_http_client()
+    for host in HTTP_HOST_LIMITS:
+        get_http_client(host)
+
+
+async def close_http_clients():
+    global _default_client
+    clients = list(_host_clients.values())
+    if _default_client is not None:
+        clients.append(_default_client)
+    _host_clients.clear()
+    _default_client = None
+    for client in clients:
+        await client.aclose()
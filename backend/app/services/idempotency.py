@@ -0,0 +1,87 @@
+import asyncio
+import datetime
+import hashlib
+import json
+import os
+from .cache import TTLCache
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+# How long a key is remembered and its first response replayed (seconds), both
+# in process and in the database; after that the key may be used afresh
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", str(24 * 3600)))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+
+
+class IdempotencyConflict(Exception):
+    """An Idempotency-Key was reused with a different request body"""
+
+
+class IdempotencyInProgress(Exception):
+    """Another worker is still processing the first request for this Idempotency-Key"""
+
+
+def idempotency_key(request):
+    """The request's Idempotency-Key header, or None; raises ValueError if malformed"""
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if key is None:
+        return None
+    key = key.strip()
+    if not key or len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise ValueError(f"{IDEMPOTENCY_HEADER} must be 1-{IDEMPOTENCY_KEY_MAX_LENGTH} characters")
+    return key
+
+
+def idempotency_cutoff():
+    """Keys stored before this (naive UTC) time have expired"""
+    return datetime.datetime.utcnow() - datetime.timedelta(seconds=IDEMPOTENCY_TTL)
+
+
+def fingerprint(data):
+    """Stable hash of a JSON request body"""
+    raw = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore:
+    """Run a side-effecting call at most once per idempotency key.
+
+    The first request for a key runs the call; a retry within the TTL gets
+    the stored result back without redoing the work, and a duplicate that
+    arrives while the first is still running awaits the same call. Only
+    successful results are stored, so a failed request can be retried with
+    the same key. The store is per process; callers also record the key in
+    the database so a retry that reaches another worker is caught there.
+    """
+
+    def __init__(self, ttl=IDEMPOTENCY_TTL, max_entries=IDEMPOTENCY_MAX_ENTRIES):
+        self.completed = TTLCache(max_entries=max_entries, ttl=ttl)  # key -> (fingerprint, result)
+        self._in_flight = {}  # key -> (fingerprint, task)
+        self.replays = 0
+
+    async def run(self, key, request_fingerprint, fn):
+        """Return (result, replayed) for `await fn()` under `key`"""
+        entry = self.completed.get(key) or self._in_flight.get(key)
+        if entry is not None:
+            stored_fingerprint, outcome = entry
+            if stored_fingerprint != request_fingerprint:
+                raise IdempotencyConflict("Idempotency-Key was already used with a different request")
+            self.replays += 1
+            if isinstance(outcome, asyncio.Future):
+                return await asyncio.shield(outcome), True
+            return outcome, True
+
+        task = asyncio.ensure_future(fn())
+        self._in_flight[key] = (request_fingerprint, task)
+
+        def finished(task):
+            self._in_flight.pop(key, None)
+            if not task.cancelled() and task.exception() is None:
+                self.completed.set(key, (request_fingerprint, task.result()))
+
+        task.add_done_callback(finished)
+        # Shielded so a client disconnect does not abort the work other duplicates await
+        return await asyncio.shield(task), False
+
+    def stats(self):
+        return {"in_flight": len(self._in_flight), "stored": len(self.completed), "replays": self.replays}
@@ -0,0 +1,141 @@
+import json
+import os
+import unicodedata
+from bisect import bisect_left
+from functools import lru_cache
+
+DEFAULT_LOCATIONS_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "locations.json")
+LOCATIONS_PATH = os.getenv("LOCATIONS_PATH", DEFAULT_LOCATIONS_PATH)
+
+# How a search term matched a location; lower ranks first
+MATCH_RANKS = {"iata": 0, "name": 1, "alias": 2}
+# Typo correction: terms shorter than this are never corrected, and terms of
+# at least TWO_EDIT_LENGTH characters may be two edits away instead of one.
+# Anything looser turns real places into other ones (Raipur -> Jaipur).
+MIN_FUZZY_LENGTH = 4
+TWO_EDIT_LENGTH = 9
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance (a swap counts as one edit); limit + 1 once it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def normalize_term(text):
+    """Lowercase, accent-free, single-spaced form used for every lookup"""
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.lower().split())
+
+
+class LocationIndex:
+    """Prefix index over city names, aliases and IATA codes.
+
+    Every term is kept in one sorted list, so the suggestions for a prefix
+    are a bisect to the first match followed by a short forward scan.
+    """
+
+    def __init__(self, locations):
+        self.locations = locations
+        entries = []
+        for i, location in enumerate(locations):
+            entries.append((normalize_term(location["name"]), "name", i))
+            for alias in location.get("aliases") or ():
+                entries.append((normalize_term(alias), "alias", i))
+            if location.get("iata"):
+                entries.append((normalize_term(location["iata"]), "iata", i))
+        entries.sort()
+        self.terms = [term for term, _, _ in entries]
+        self.entries = [(kind, i) for _, kind, i in entries]
+        self.exact = {}
+        # Names and aliases by first letter; the only candidates for typo correction
+        self.fuzzy = {}
+        for term, kind, i in entries:
+            self.exact.setdefault(term, i)
+            if kind != "iata" and len(term) >= MIN_FUZZY_LENGTH:
+                self.fuzzy.setdefault(term[0], []).append((term, i))
+        self.resolve = lru_cache(maxsize=4096)(self._resolve)
+
+    def __len__(self):
+        return len(self.locations)
+
+    @classmethod
+    def load(cls, path=LOCATIONS_PATH):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def suggest(self, prefix, limit=8):
+        """Locations with a name, alias or IATA code starting with `prefix`.
+
+        Exact matches come first, then IATA codes, names and aliases; ties
+        keep the gazetteer's order (most travelled first).
+        """
+        prefix = normalize_term(prefix)
+        if not prefix:
+            return []
+        best = {}
+        for pos in range(bisect_left(self.terms, prefix), len(self.terms)):
+            term = self.terms[pos]
+            if not term.startswith(prefix):
+                break
+            kind, i = self.entries[pos]
+            rank = (term != prefix, MATCH_RANKS[kind], i)
+            if i not in best or rank < best[i][0]:
+                best[i] = (rank, kind)
+        ranked = sorted(best.items(), key=lambda item: item[1][0])[:limit]
+        return [{**self.locations[i], "matched": kind} for i, (_, kind) in ranked]
+
+    def _resolve(self, text):
+        """The location `text` names, allowing typos; None if unknown"""
+        term = normalize_term(text)
+        if term in self.exact:
+            return self.locations[self.exact[term]]
+        i = self.correct(term)
+        return self.locations[i] if i is not None else None
+
+    def correct(self, term):
+        """Index of the one location `term` is a typo of, else None.
+
+        A typo keeps the first letter and is one edit away (two for long
+        terms). A term that only adds or drops letters at the end ("New
+        Yorker") is a different word, and a term close to two different
+        locations is ambiguous; neither is corrected.
+        """
+        if len(term) < MIN_FUZZY_LENGTH:
+            return None
+        limit = 2 if len(term) >= TWO_EDIT_LENGTH else 1
+        matches = set()
+        for candidate, i in self.fuzzy.get(term[0], ()):
+            if candidate.startswith(term) or term.startswith(candidate):
+                continue
+            if edit_distance(term, candidate, limit) <= limit:
+                matches.add(i)
+        return matches.pop() if len(matches) == 1 else None
+
+    def canonical_name(self, text):
+        """Gazetteer name for `text` (e.g. "bengaluru" -> "Bangalore"), else `text` unchanged"""
+        location = self.resolve(text)
+        return location["name"] if location else text
+
+    def iata_code(self, text):
+        """IATA code for a city name, alias or code; the upper-cased input if unknown"""
+        location = self.resolve(text)
+        if location and location.get("iata"):
+            return location["iata"]
+        return text.strip().upper()
+
+
+LOCATIONS = LocationIndex.load()
@@ -0,0 +1,73 @@
+from dataclasses import dataclass
+from functools import total_ordering
+from numbers import Real
+
+# Display prefix per currency; anything else is shown as "<CODE> "
+CURRENCY_SYMBOLS = {"INR": "₹ ", "USD": "$", "EUR": "€", "GBP": "£"}
+
+
+def group_digits(digits, currency):
+    """Insert thousands separators (Indian lakh/crore grouping for INR)"""
+    if len(digits) <= 3:
+        return digits
+    head, tail = digits[:-3], digits[-3:]
+    size = 2 if currency == "INR" else 3
+    groups = []
+    while head:
+        groups.insert(0, head[-size:])
+        head = head[:-size]
+    return ",".join(groups + [tail])
+
+
+@total_ordering
+@dataclass(frozen=True)
+class Money:
+    """Amount in integer minor units (paise, cents) plus an ISO currency code.
+
+    Search results keep prices as Money so sorting and filtering compare
+    plain integers; format() is only called when a response is serialized.
+    Arithmetic and ordering between different currencies raise ValueError.
+    """
+    minor: int
+    currency: str = "INR"
+
+    @classmethod
+    def of(cls, amount, currency="INR"):
+        """Build from an amount in major units (rupees, dollars)"""
+        return cls(int(round(amount * 100)), currency)
+
+    @property
+    def amount(self):
+        return self.minor / 100
+
+    def _check_currency(self, other, operation):
+        if self.currency != other.currency:
+            raise ValueError(f"Cannot {operation} {self.currency} and {other.currency}")
+
+    def __add__(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        self._check_currency(other, "add")
+        return Money(self.minor + other.minor, self.currency)
+
+    def __mul__(self, factor):
+        if not isinstance(factor, Real):
+            return NotImplemented
+        return Money(int(round(self.minor * factor)), self.currency)
+
+    __rmul__ = __mul__
+
+    def __lt__(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        self._check_currency(other, "compare")
+        return self.minor < other.minor
+
+    def format(self):
+        """Display string, e.g. "₹ 1,10,000" or "$199" """
+        major, minor = divmod(abs(self.minor), 100)
+        text = group_digits(str(major), self.currency)
+        if minor:
+            text += f".{minor:02d}"
+        sign = "-" if self.minor < 0 else ""
+        return f"{sign}{CURRENCY_SYMBOLS.get(self.currency, self.currency + ' ')}{text}"
@@ -0,0 +1,99 @@
+"""bcrypt hashing on a dedicated, bounded process pool.
+
+A bcrypt hash is hundreds of milliseconds of CPU under the GIL, so it runs
+in worker processes instead of the event loop or the request threadpool.
+At most PASSWORD_HASH_WORKERS hashes run at once and at most
+PASSWORD_HASH_QUEUE_LIMIT more may wait; beyond that a request is rejected
+straight away (the auth routes answer 503) rather than queueing behind a
+burst of logins.
+"""
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from passlib.context import CryptContext
+from .metrics import REGISTRY, CallbackMetric, Counter, Histogram
+
+# bcrypt cost factor for new hashes; stored hashes with another cost are rehashed on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(os.cpu_count() or 2, 4))))
+# Hash requests allowed to wait for a worker before new ones are rejected
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", str(PASSWORD_HASH_WORKERS * 4)))
+
+PASSWORD_HASH_DURATION = REGISTRY.register(Histogram(
+    "password_hash_duration_seconds",
+    "Time to hash or verify a password, including time queued for a worker",
+    ("operation",),
+))
+PASSWORD_HASH_REJECTED = REGISTRY.register(Counter(
+    "password_hash_rejected_total",
+    "Password hash requests rejected because the pool queue was full",
+    ("operation",),
+))
+
+
+class PasswordHasherBusy(Exception):
+    """The hashing pool is saturated; retry shortly"""
+
+
+@lru_cache(maxsize=None)
+def password_context(rounds=BCRYPT_ROUNDS):
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+
+
+# Run in the worker processes
+def _hash(password, rounds):
+    return password_context(rounds).hash(password)
+
+
+def _verify_and_update(password, hashed, rounds):
+    return password_context(rounds).verify_and_update(password, hashed)
+
+
+class PasswordHasher:
+    def __init__(self, workers=PASSWORD_HASH_WORKERS, queue_limit=PASSWORD_HASH_QUEUE_LIMIT, rounds=BCRYPT_ROUNDS):
+        self.workers = workers
+        self.max_pending = workers + queue_limit
+        self.rounds = rounds
+        self.pending = 0
+        self._executor = None
+
+    def start(self):
+        if self._executor is None:
+            # spawn: forking a process that already runs threads and an event loop is unsafe
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _run(self, operation, fn, *args):
+        if self.pending >= self.max_pending:
+            PASSWORD_HASH_REJECTED.inc(operation)
+            raise PasswordHasherBusy("Password hashing is saturated")
+        self.start()
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.pending -= 1
+            PASSWORD_HASH_DURATION.observe(time.perf_counter() - started, operation)
+
+    async def hash(self, password):
+        return await self._run("hash", _hash, password, self.rounds)
+
+    async def verify_and_update(self, password, hashed):
+        """(valid, new_hash); new_hash is set when the stored hash should be replaced"""
+        return await self._run("verify", _verify_and_update, password, hashed, self.rounds)
+
+
+PASSWORD_HASHER = PasswordHasher()
+
+REGISTRY.register(CallbackMetric(
+    "password_hash_pending", "Password hash requests running or queued", (),
+    lambda: [((), PASSWORD_HASHER.pending)],
+))
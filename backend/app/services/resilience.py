@@ -0,0 +1,124 @@
+import asyncio
+import time
+from collections import deque
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose breaker is open"""
+
+
+class CircuitBreaker:
+    """Stop calling an upstream after repeated failures.
+
+    closed    -> calls go through; `failure_threshold` consecutive failures
+                 open the breaker
+    open      -> calls fail fast with CircuitOpenError for `reset_timeout` s
+    half_open -> a single probe call is let through; success closes the
+                 breaker, failure opens it again
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self.rejected = 0
+        self._probing = False
+
+    def allow(self):
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"
+        if self.state == "closed":
+            return True
+        if self.state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.trips += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    async def call(self, fn, *args, **kwargs):
+        if not self.allow():
+            self.rejected += 1
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        try:
+            result = await fn(*args, **kwargs)
+        except asyncio.CancelledError:
+            self._probing = False
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
+
+
+class LatencyTracker:
+    """Rolling window of recent call latencies (seconds)"""
+
+    def __init__(self, window=200):
+        self.samples = deque(maxlen=window)
+
+    def __len__(self):
+        return len(self.samples)
+
+    def observe(self, seconds):
+        self.samples.append(seconds)
+
+    def percentile(self, p):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(len(ordered) * p / 100))
+        return ordered[index]
+
+
+async def hedged(fn, *args, hedge_after=None):
+    """Await `fn(*args)`, starting a second identical call if the first has
+    not answered within `hedge_after` seconds. The first result wins and the
+    other call is cancelled.
+    """
+    first = asyncio.ensure_future(fn(*args))
+    if hedge_after is None:
+        return await first
+    pending = {first}
+    try:
+        done, _ = await asyncio.wait(pending, timeout=hedge_after)
+        if done:
+            return first.result()
+        pending.add(asyncio.ensure_future(fn(*args)))
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+            if not pending:
+                # Both attempts failed; surface the last error
+                return done.pop().result()
+    finally:
+        for task in pending:
+            task.cancel()
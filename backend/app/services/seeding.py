@@ -0,0 +1,17 @@
+import hashlib
+import random
+
+
+def stable_seed(*parts):
+    """64-bit seed derived from normalized parts.
+
+    Uses a real hash rather than hash(), which is salted per process, so the
+    same search yields the same results across restarts and workers.
+    """
+    text = "|".join(str(part).strip().lower() for part in parts)
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+
+
+def seeded_random(*parts):
+    """A private random.Random seeded from `parts`"""
+    return random.Random(stable_seed(*parts))
@@ -0,0 +1,46 @@
+import asyncio
+
+
+def normalize_key(*parts):
+    """Build a coalescing key from request parameters.
+
+    Strings are stripped and lowercased so "DEL " and "del" share one call.
+    """
+    key = []
+    for part in parts:
+        if isinstance(part, str):
+            part = part.strip().lower()
+        key.append(part)
+    return tuple(key)
+
+
+class SingleFlight:
+    """Coalesce concurrent identical calls into one in-flight call.
+
+    The first caller for a key starts `fn`; every caller that arrives while it
+    is still running awaits the same result (or exception). The shared call
+    runs as its own task, so one caller disconnecting does not cancel it for
+    the others.
+    """
+
+    def __init__(self):
+        self._calls = {}  # key -> running task
+        self.calls = 0
+        self.coalesced = 0
+
+    def __len__(self):
+        return len(self._calls)
+
+    async def do(self, key, fn, *args, **kwargs):
+        task = self._calls.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def stats(self):
+        return {"in_flight": len(self._calls), "calls": self.calls, "coalesced": self.coalesced}
@@ -0,0 +1,47 @@
+import json
+from collections.abc import Iterator
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
+
+
+def wants_sse(request):
+    """SSE if asked for via ?format=sse or the Accept header, else NDJSON"""
+    if request.query_params.get("format") == "sse":
+        return True
+    return "text/event-stream" in request.headers.get("accept", "")
+
+
+async def _iterate(items):
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    elif isinstance(items, Iterator):
+        # Sync generators may do real work per item; keep it off the event loop
+        async for item in iterate_in_threadpool(items):
+            yield item
+    else:
+        # Already-built collections cost nothing to walk, so skip the threadpool hop per item
+        for item in items:
+            yield item
+
+
+async def _encode(items, serialize, sse):
+    count = 0
+    async for item in _iterate(items):
+        payload = json.dumps(serialize(item))
+        count += 1
+        yield f"event: result\ndata: {payload}\n\n" if sse else payload + "\n"
+    if sse:
+        yield f"event: end\ndata: {json.dumps({'count': count})}\n\n"
+
+
+def stream_results(request, items, serialize):
+    """Stream `items` one serialized result at a time as NDJSON or SSE.
+
+    `items` may be a sync or async iterable, so results go out as soon as
+    they are produced instead of after the full list is built.
+    """
+    sse = wants_sse(request)
+    media_type = "text/event-stream" if sse else "application/x-ndjson"
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(_encode(items, serialize, sse), media_type=media_type, headers=headers)
@@ -0,0 +1,236 @@
+"""Per-user Uber OAuth tokens.
+
+Tokens live in the uber_tokens table so they survive restarts and are shared
+by every worker; reads go through a short-lived in-process cache. A
+background task refreshes tokens shortly before they expire, so request
+paths normally find a valid token without waiting on a token exchange.
+"""
+import asyncio
+import datetime
+import logging
+import os
+from starlette.concurrency import run_in_threadpool
+from ..database import SessionLocal
+from ..models import UberToken
+from .cache import TTLCache
+from .http_client import get_http_client
+from .metrics import upstream_timer
+from .singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+UBER_CLIENT_ID = os.getenv("UBER_CLIENT_ID")
+UBER_CLIENT_SECRET = os.getenv("UBER_CLIENT_SECRET")
+UBER_REDIRECT_URI = os.getenv("UBER_REDIRECT_URI", "http://localhost:8000/api/transport/uber/callback")
+UBER_TOKEN_URL = "https://login.uber.com/oauth/v2/token"
+UBER_HOST = "login.uber.com"
+
+# Refresh a token once it is this close to expiry (seconds)
+UBER_TOKEN_REFRESH_AHEAD = float(os.getenv("UBER_TOKEN_REFRESH_AHEAD", "600"))
+# How often the background task looks for tokens due a refresh (seconds)
+UBER_TOKEN_REFRESH_INTERVAL = float(os.getenv("UBER_TOKEN_REFRESH_INTERVAL", "60"))
+# Parallel refreshes per background sweep
+UBER_TOKEN_REFRESH_CONCURRENCY = 4
+
+# Cached rows are re-read after the TTL so a refresh done by another worker is picked up
+UBER_TOKEN_CACHE = TTLCache(
+    max_entries=int(os.getenv("UBER_TOKEN_CACHE_MAX_ENTRIES", "4096")),
+    ttl=float(os.getenv("UBER_TOKEN_CACHE_TTL", "120")),
+)
+# A user's token is refreshed by at most one call at a time
+UBER_TOKEN_REFRESHES = SingleFlight()
+
+_refresher = None
+
+
+class UberTokenError(Exception):
+    """Uber's token endpoint rejected a code or refresh token"""
+
+    def __init__(self, status_code, detail):
+        super().__init__(f"Uber token request failed ({status_code}): {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+
+def token_record(row):
+    return {
+        "access_token": row.access_token,
+        "refresh_token": row.refresh_token,
+        "scope": row.scope,
+        "expires_at": row.expires_at,
+    }
+
+
+def load_token(user_id):
+    db = SessionLocal()
+    try:
+        row = db.get(UberToken, user_id)
+        return token_record(row) if row else None
+    finally:
+        db.close()
+
+
+def store_token(user_id, token_data):
+    """Upsert a token response from Uber for `user_id`; returns the stored record"""
+    expires_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=int(token_data.get("expires_in", 3600)))
+    db = SessionLocal()
+    try:
+        row = db.get(UberToken, user_id) or UberToken(user_id=user_id)
+        row.access_token = token_data["access_token"]
+        # Uber may omit the refresh token on refresh; keep the previous one then
+        row.refresh_token = token_data.get("refresh_token") or row.refresh_token
+        row.scope = token_data.get("scope") or row.scope
+        row.expires_at = expires_at
+        db.add(row)
+        db.commit()
+        return token_record(row)
+    finally:
+        db.close()
+
+
+def delete_token(user_id, refresh_token=None):
+    """Delete the user's token; with `refresh_token`, only if that is still the stored one.
+
+    Returns whether a row was deleted.
+    """
+    db = SessionLocal()
+    try:
+        query = db.query(UberToken).filter(UberToken.user_id == user_id)
+        if refresh_token is not None:
+            query = query.filter(UberToken.refresh_token == refresh_token)
+        deleted = query.delete()
+        db.commit()
+        return deleted > 0
+    finally:
+        db.close()
+
+
+def users_due_refresh(ahead):
+    """Users whose token expires within `ahead` seconds and can be refreshed"""
+    due = datetime.datetime.utcnow() + datetime.timedelta(seconds=ahead)
+    db = SessionLocal()
+    try:
+        rows = db.query(UberToken.user_id).filter(
+            UberToken.expires_at <= due, UberToken.refresh_token.isnot(None)
+        ).all()
+        return [user_id for (user_id,) in rows]
+    finally:
+        db.close()
+
+
+async def request_token(form):
+    """POST to Uber's token endpoint over the shared connection pool"""
+    client = get_http_client(UBER_HOST)
+    data = {"client_id": UBER_CLIENT_ID, "client_secret": UBER_CLIENT_SECRET, **form}
+    headers = {"Content-Type": "application/x-www-form-urlencoded"}
+    with upstream_timer("uber_oauth"):
+        resp = await client.post(UBER_TOKEN_URL, data=data, headers=headers)
+    if resp.status_code != 200:
+        raise UberTokenError(resp.status_code, resp.text)
+    return resp.json()
+
+
+async def exchange_code(user_id, code):
+    """Exchange an authorization code for tokens and store them for `user_id`"""
+    token_data = await request_token({
+        "grant_type": "authorization_code",
+        "redirect_uri": UBER_REDIRECT_URI,
+        "code": code
+    })
+    record = await run_in_threadpool(store_token, user_id, token_data)
+    UBER_TOKEN_CACHE.set(user_id, record)
+    return record
+
+
+async def refresh_token(user_id):
+    """Refresh `user_id`'s token; concurrent refreshes for one user share a call"""
+    return await UBER_TOKEN_REFRESHES.do(user_id, _refresh_token, user_id)
+
+
+async def _refresh_token(user_id):
+    record = await run_in_threadpool(load_token, user_id)
+    if not record or not record["refresh_token"]:
+        return record
+    try:
+        token_data = await request_token({
+            "grant_type": "refresh_token",
+            "refresh_token": record["refresh_token"]
+        })
+    except UberTokenError as e:
+        if e.status_code in (400, 401):
+            # Refresh token revoked or expired: the user has to connect Uber again.
+            # Every worker sweeps the same due rows, so the token may have been
+            # rejected because another worker already rotated it; only delete
+            # the row if it still holds the refresh token that was refused.
+            deleted = await run_in_threadpool(delete_token, user_id, record["refresh_token"])
+            record = None if deleted else await run_in_threadpool(load_token, user_id)
+            UBER_TOKEN_CACHE.set(user_id, record)
+            return record
+        raise
+    record = await run_in_threadpool(store_token, user_id, token_data)
+    UBER_TOKEN_CACHE.set(user_id, record)
+    return record
+
+
+async def get_uber_token(user_id):
+    """The user's current token record, or None if they have not connected Uber.
+
+    Served from the cache or database. A token close to expiry is refreshed in
+    the background; only an already expired token waits for the refresh.
+    """
+    record = await UBER_TOKEN_CACHE.get_or_load(user_id, lambda: run_in_threadpool(load_token, user_id))
+    if record is None:
+        return None
+    remaining = (record["expires_at"] - datetime.datetime.utcnow()).total_seconds()
+    if remaining <= 0:
+        return await refresh_token(user_id)
+    if remaining < UBER_TOKEN_REFRESH_AHEAD and record["refresh_token"]:
+        asyncio.ensure_future(_refresh_quietly(user_id))
+    return record
+
+
+async def _refresh_quietly(user_id):
+    try:
+        await refresh_token(user_id)
+    except Exception as e:
+        logger.warning("Uber token refresh error for user %s: %s", user_id, e)
+
+
+async def refresh_due_tokens():
+    """Refresh every token expiring within UBER_TOKEN_REFRESH_AHEAD"""
+    user_ids = await run_in_threadpool(users_due_refresh, UBER_TOKEN_REFRESH_AHEAD)
+    semaphore = asyncio.Semaphore(UBER_TOKEN_REFRESH_CONCURRENCY)
+
+    async def refresh(user_id):
+        async with semaphore:
+            await _refresh_quietly(user_id)
+
+    await asyncio.gather(*(refresh(user_id) for user_id in user_ids))
+    return len(user_ids)
+
+
+async def _refresh_loop():
+    while True:
+        try:
+            await refresh_due_tokens()
+        except Exception as e:
+            logger.exception("Uber token refresh sweep error: %s", e)
+        await asyncio.sleep(UBER_TOKEN_REFRESH_INTERVAL)
+
+
+def start_uber_token_refresher():
+    """Start the background refresh-ahead task (no-op without Uber credentials)"""
+    global _refresher
+    if _refresher is None and UBER_CLIENT_ID and UBER_CLIENT_SECRET:
+        _refresher = asyncio.ensure_future(_refresh_loop())
+
+
+async def stop_uber_token_refresher():
+    global _refresher
+    if _refresher is not None:
+        _refresher.cancel()
+        try:
+            await _refresher
+        except asyncio.CancelledError:
+            pass
+        _refresher = None
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Tests for location normalization: typo correction must not turn one real
+place into another
+"""
+
+import pytest
+
+from app.services.fares import FARES
+from app.services.locations import LOCATIONS
+
+
+@pytest.mark.parametrize("text", ["Raipur", "Mangalore", "Bengal", "Bangor", "New Yorker"])
+def test_distinct_places_are_not_corrected(text):
+    assert LOCATIONS.resolve(text) is None
+    assert LOCATIONS.canonical_name(text) == text
+    assert LOCATIONS.iata_code(text) == text.upper()
+    assert FARES.city_of(text) is None
+
+
+@pytest.mark.parametrize("text, name", [
+    ("Mumbay", "Mumbai"),
+    ("Banglore", "Bangalore"),
+    ("Hydrabad", "Hyderabad"),
+    ("Dehli", "Delhi"),
+    ("bengaluru", "Bangalore"),
+    ("BOM", "Mumbai"),
+])
+def test_typos_and_aliases_resolve(text, name):
+    assert LOCATIONS.canonical_name(text) == name
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
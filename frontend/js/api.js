@@ -1,5 +1,25 @@
 // API functions for frontend-backend communication
 
+// JSON headers plus the signed-in user's bearer token, if any
+window.authHeaders = function() {
+    const headers = { 'Content-Type': 'application/json' };
+    const token = localStorage.getItem('authToken');
+    if (token) headers['Authorization'] = `Bearer ${token}`;
+    return headers;
+};
+
+// fetch() for endpoints that need a signed-in user: sends the token and, on
+// 401 (not logged in or token expired), clears it and asks the user to log in
+window.authFetch = async function(url, options = {}) {
+    const response = await fetch(url, { ...options, headers: { ...authHeaders(), ...(options.headers || {}) } });
+    if (response.status === 401) {
+        logout();
+        promptLogin('Please log in to continue');
+        throw new Error('Please log in to continue');
+    }
+    return response;
+};
+
 // Make functions globally available
 window.searchFlights = async function(data) {
     const response = await fetch('/api/flights/search', {
@@ -32,9 +52,8 @@ window.searchTransport = async function(data) {
 };
 
 window.bookFlight = async function(flightId) {
-    const response = await fetch('/api/bookings/', {
+    const response = await authFetch('/api/bookings/', {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ type: 'flight', id: flightId })
     });
     if (!response.ok) throw new Error('Flight booking failed');
@@ -42,9 +61,8 @@ window.bookFlight = async function(flightId) {
 };
 
 window.bookHotel = async function(hotelId) {
-    const response = await fetch('/api/bookings/', {
+    const response = await authFetch('/api/bookings/', {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ type: 'hotel', id: hotelId })
     });
     if (!response.ok) throw new Error('Hotel booking failed');
@@ -52,9 +70,8 @@ window.bookHotel = async function(hotelId) {
 };
 
 window.bookTransport = async function(transportId) {
-    const response = await fetch('/api/bookings/', {
+    const response = await authFetch('/api/bookings/', {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ type: 'transport', id: transportId })
     });
     if (!response.ok) throw new Error('Transport booking failed');
@@ -1,21 +1,127 @@
-// Placeholder for frontend authentication logic 
-// (No AJAX, no validation, just structure)
+// Frontend authentication: login/signup against /api/auth, token kept in localStorage
+// (bookings and payments send it as a Bearer token through authFetch() in api.js)
+
+window.isLoggedIn = function() {
+    return !!localStorage.getItem('authToken');
+};
+
+window.logout = function() {
+    localStorage.removeItem('authToken');
+    localStorage.removeItem('authUser');
+    updateAuthNav();
+};
+
+// Open the login modal, e.g. when a booking needs a signed-in user
+window.promptLogin = function(message) {
+    const loginModal = document.getElementById('loginModal');
+    if (loginModal) loginModal.classList.add('active');
+    if (message && window.showNotification) showNotification(message, 'warning');
+};
+
+async function login(email, password) {
+    const response = await fetch('/api/auth/login', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ email: email, password: password, name: '' })
+    });
+    if (response.status === 401) throw new Error('Invalid email or password');
+    if (!response.ok) throw new Error('Login failed, please try again');
+    const result = await response.json();
+    localStorage.setItem('authToken', result.access_token);
+    localStorage.setItem('authUser', JSON.stringify(result.user));
+    updateAuthNav();
+    return result.user;
+}
+
+async function signup(name, email, password) {
+    const response = await fetch('/api/auth/signup', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ name: name, email: email, password: password })
+    });
+    if (!response.ok) {
+        const error = await response.json().catch(() => ({}));
+        throw new Error(error.detail || 'Sign up failed, please try again');
+    }
+    return await login(email, password);
+}
+
+// Show "Hi, <name> / Logout" instead of the Login/Sign Up buttons when signed in
+function updateAuthNav() {
+    const loginBtn = document.getElementById('loginBtn');
+    const signupBtn = document.getElementById('signupBtn');
+    const navAuth = document.querySelector('.nav-auth');
+    if (!navAuth) return;
+    let userBox = document.getElementById('navUser');
+    const user = JSON.parse(localStorage.getItem('authUser') || 'null');
+    const loggedIn = isLoggedIn() && user;
+
+    if (loginBtn) loginBtn.style.display = loggedIn ? 'none' : '';
+    if (signupBtn) signupBtn.style.display = loggedIn ? 'none' : '';
+    if (!loggedIn) {
+        if (userBox) userBox.remove();
+        return;
+    }
+    if (!userBox) {
+        userBox = document.createElement('div');
+        userBox.id = 'navUser';
+        userBox.innerHTML = '<span class="nav-user-name"></span> <button class="btn btn-outline" id="logoutBtn">Logout</button>';
+        navAuth.appendChild(userBox);
+        userBox.querySelector('#logoutBtn').addEventListener('click', logout);
+    }
+    userBox.querySelector('.nav-user-name').textContent = `Hi, ${user.name}`;
+}
 
 document.addEventListener('DOMContentLoaded', function() {
+    updateAuthNav();
+
+    // Drop a stored token the server no longer accepts (expired, user deleted)
+    if (isLoggedIn()) {
+        fetch('/api/users/profile', { headers: authHeaders() }).then(function(response) {
+            if (response.status === 401) logout();
+        }).catch(function() {});
+    }
+
     // Login form
     const loginForm = document.getElementById('loginForm');
     if (loginForm) {
-        loginForm.addEventListener('submit', function(e) {
-            // Placeholder: handle login submit
-            // e.preventDefault(); // Uncomment to prevent default form submit
+        loginForm.addEventListener('submit', async function(e) {
+            e.preventDefault();
+            try {
+                const user = await login(
+                    document.getElementById('loginEmail').value.trim(),
+                    document.getElementById('loginPassword').value
+                );
+                document.getElementById('loginModal').classList.remove('active');
+                loginForm.reset();
+                showNotification(`Welcome back, ${user.name}!`, 'success');
+            } catch (error) {
+                showNotification(error.message, 'error');
+            }
         });
     }
     // Signup form
     const signupForm = document.getElementById('signupForm');
     if (signupForm) {
-        signupForm.addEventListener('submit', function(e) {
-            // Placeholder: handle signup submit
-            // e.preventDefault(); // Uncomment to prevent default form submit
+        signupForm.addEventListener('submit', async function(e) {
+            e.preventDefault();
+            const password = document.getElementById('signupPassword').value;
+            if (password !== document.getElementById('signupConfirmPassword').value) {
+                showNotification('Passwords do not match', 'error');
+                return;
+            }
+            try {
+                const user = await signup(
+                    document.getElementById('signupName').value.trim(),
+                    document.getElementById('signupEmail').value.trim(),
+                    password
+                );
+                document.getElementById('signupModal').classList.remove('active');
+                signupForm.reset();
+                showNotification(`Welcome, ${user.name}!`, 'success');
+            } catch (error) {
+                showNotification(error.message, 'error');
+            }
         });
     }
-}); 
\ No newline at end of file
+});
@@ -113,11 +113,8 @@ async function createPaymentOrder(bookingType, itemData) {
         
         console.log('📤 Sending order data:', orderData);
         
-        const response = await fetch('/api/payments/create-order', {
+        const response = await authFetch('/api/payments/create-order', {
             method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
             body: JSON.stringify(orderData)
         });
         
@@ -176,11 +173,8 @@ async function verifyPayment(paymentResponse) {
     try {
         console.log('🔍 Verifying payment:', paymentResponse);
         
-        const response = await fetch('/api/payments/verify-payment', {
+        const response = await authFetch('/api/payments/verify-payment', {
             method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
             body: JSON.stringify(paymentResponse)
         });
         
@@ -248,11 +242,8 @@ async function createBookingRecord(itemId, bookingType, paymentResult) {
             order_id: paymentResult.order_id
         };
         
-        const response = await fetch('/api/bookings/', {
+        const response = await authFetch('/api/bookings/', {
             method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
             body: JSON.stringify(bookingData)
         });
         
@@ -276,6 +267,11 @@ window.bookItem = async function(itemId, bookingType) {
     console.log(`📅 Booking ${bookingType} with ID: ${itemId}`);
     console.log('🔍 Current search results:', searchResults);
     
+    if (!isLoggedIn()) {
+        promptLogin('Please log in to book');
+        return;
+    }
+    
     try {
         // Initialize Razorpay first
         await initializeRazorpay();